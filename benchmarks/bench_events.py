@@ -0,0 +1,62 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import datetime
+import os
+import sys
+import timeit
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(__file__), os.pardir, "src", "main", "python")
+)
+
+from buffbot.core.events import Event, dispatcher  # noqa: E402
+
+LINES = [
+    "A gnoll pup hits YOU for 12 points of damage.",
+    "You slash a gnoll pup for 27 points of damage.",
+    "A gnoll pup tries to hit YOU, but misses!",
+    "Soandso says, 'Hail, Buffbot'",
+    "You begin casting Spirit of Wolf.",
+    "Your Spirit of Wolf spell fizzles!",
+    "Your target is out of range, get closer!",
+    "Your Aegolism spell did not take hold on Soandso. (Blocked by Aegolism.)",
+    "Soandso feels the spirit of wolf.",
+    "You have been healed for 154 points.",
+]
+
+
+def _subclass_scan(date, line):
+    # The original per-line classification, kept here so we have something to
+    # compare against.
+    for event_type in Event.__subclasses__():
+        if event := event_type.search(date, line):
+            return event
+
+
+def _dispatch(date, line):
+    return dispatcher.parse(date, line)
+
+
+def main():
+    date = datetime.datetime.now()
+    lines = LINES * 1000
+
+    for name, func in [("subclass scan", _subclass_scan), ("dispatcher", _dispatch)]:
+        best = min(
+            timeit.repeat(lambda: [func(date, line) for line in lines], number=1)
+        )
+        print(f"{name:>15}: {len(lines) / best:12,.0f} lines/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import os
+import sys
+import tempfile
+
+from datetime import datetime, timedelta
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(__file__), os.pardir, "src", "main", "python")
+)
+
+from bench_planner import CHARACTER, SimulatedGame, _run  # noqa: E402
+
+from buffbot.core import BuffBot  # noqa: E402
+from buffbot.core.groups import GroupRoster  # noqa: E402
+from buffbot.core.output import RecordingBackend  # noqa: E402
+from buffbot.core.replay import VirtualClock  # noqa: E402
+from buffbot.core.types import Spell, SpellScope  # noqa: E402
+from buffbot.core.utils import FakeFocus  # noqa: E402
+
+SPELLS = [
+    Spell(
+        name="Blessing of Aegolism",
+        gem=1,
+        success_message="{target} looks very healthy.",
+        cast_time=timedelta(seconds=6),
+        recast=timedelta(seconds=0),
+        scope=SpellScope.Group,
+    ),
+    Spell(
+        name="Spirit of Wolf",
+        gem=2,
+        success_message="{target} runs like a wolf.",
+        cast_time=timedelta(seconds=3),
+        recast=timedelta(seconds=0),
+    ),
+]
+
+
+def bench_burst(tmpdir, groups, size, roster):
+    # A raid's worth of groups all hail us at once, with everyone from each
+    # group hailing one after another, and we see how long it takes to buff
+    # them, with and without knowing who is grouped with who.
+    clock = VirtualClock(datetime(2020, 10, 24, 20, 0, 0))
+    output = RecordingBackend(clock=clock)
+    members = [
+        [f"G{group:02d}Member{idx}" for idx in range(size)] for group in range(groups)
+    ]
+    game = SimulatedGame(clock, SPELLS, members)
+
+    filename = os.path.join(tmpdir, f"eqlog_{CHARACTER}_xegony.txt")
+    open(filename, "w").close()
+    bot = BuffBot(
+        filename=filename,
+        spells=SPELLS,
+        acls=[],
+        logger=lambda line: None,
+        clock=clock,
+        output=output,
+        focus=FakeFocus(True),
+        roster=GroupRoster(members if roster else []),
+    )
+    bot.load()
+
+    started = clock.now
+    for group in members:
+        for name in group:
+            game.say(started, f"{name} says, 'Hail, {CHARACTER}'")
+    _run(bot, game, output, clock)
+
+    minutes = (clock.now - started).total_seconds() / 60
+    return {
+        "people": groups * size,
+        "landed": len(game.buffed),
+        "casts": game.casts,
+        "minutes": minutes,
+        "buffs_per_minute": len(game.buffed) / minutes,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compare buffing groups with and without knowing the groups."
+    )
+    parser.add_argument("--groups", type=int, default=5)
+    parser.add_argument("--size", type=int, default=6)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for name, roster in [("no roster", False), ("roster", True)]:
+            result = bench_burst(tmpdir, args.groups, args.size, roster)
+            print(
+                f"{name:>10}: {result['landed']:,} buffs on "
+                f"{result['people']:,} people with {result['casts']:,} casts in "
+                f"{result['minutes']:.1f} min, "
+                f"{result['buffs_per_minute']:.1f} buffs/min"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import heapq
+import os
+import sys
+import tempfile
+
+from datetime import datetime, timedelta
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(__file__), os.pardir, "src", "main", "python")
+)
+
+from buffbot.core import BuffBot  # noqa: E402
+from buffbot.core.latency import LatencyTracker  # noqa: E402
+from buffbot.core.output import RecordingBackend  # noqa: E402
+from buffbot.core.planner import CastPlanner  # noqa: E402
+from buffbot.core.replay import VirtualClock  # noqa: E402
+from buffbot.core.types import Spell, SpellScope  # noqa: E402
+from buffbot.core.utils import FakeFocus  # noqa: E402
+
+CHARACTER = "Buffbot"
+
+# Unlike the spells in loggen, these need to know how long they take, so that
+# the game we simulate can answer casts of them.
+SPELLS = [
+    Spell(
+        name="Aegolism",
+        gem=1,
+        success_message="{target} looks very healthy.",
+        duration=timedelta(hours=3),
+        cast_time=timedelta(seconds=5),
+        recast=timedelta(seconds=30),
+    ),
+    Spell(
+        name="Spirit of Wolf",
+        gem=2,
+        success_message="{target} runs like a wolf.",
+        duration=timedelta(minutes=5),
+        cast_time=timedelta(seconds=3),
+        recast=timedelta(seconds=0),
+    ),
+    Spell(
+        name="Clarity",
+        gem=3,
+        success_message="{target} looks very tranquil.",
+        duration=timedelta(minutes=5),
+        cast_time=timedelta(seconds=4),
+        recast=timedelta(seconds=8),
+    ),
+]
+
+
+class SimulatedGame:
+    # Just enough of EverQuest to answer the commands that the bot sends,
+    # targeting is instant, and a spell lands once it has finished casting,
+    # unless its gem is still on its recast timer, in which case nothing
+    # happens at all, and the bot is left waiting until it gives up. Group
+    # spells land on everyone in the target's group.
+    def __init__(self, clock, spells, groups=()):
+        self.clock = clock
+        self.spells = {spell.gem: spell for spell in spells}
+        self.groups = {name: group for group in groups for name in group}
+        self.target = None
+        self.casts = 0
+        self.buffed = set()
+
+        self._ready = {}
+        self._lines = []
+        self._seq = 0
+
+    def say(self, when, text):
+        self._seq += 1
+        heapq.heappush(self._lines, (when, self._seq, text))
+
+    def command(self, command):
+        now = self.clock()
+        if command.startswith("/tar "):
+            self.target = command[5:]
+        elif command.startswith("/say "):
+            self.say(now, f"You say, '{command[5:].replace('%t', self.target)}'")
+        elif command.startswith("/cast "):
+            spell = self.spells[int(command[6:])]
+            if self._ready.get(spell.gem, now) > now:
+                return
+            finished = now + spell.cast_time
+            self._ready[spell.gem] = finished + spell.recast
+            self.say(now, f"You begin casting {spell.name}.")
+            members = (
+                self.groups.get(self.target, [self.target])
+                if spell.scope is SpellScope.Group
+                else [self.target]
+            )
+            for member in sorted(members, key=lambda name: name != self.target):
+                self.say(finished, spell.success_message.format(target=member))
+            self.casts += 1
+            self.buffed.update((member, spell.name) for member in members)
+
+    def next_line(self):
+        return self._lines[0][0] if self._lines else None
+
+    def lines(self):
+        while self._lines and self._lines[0][0] <= self.clock():
+            when, _, text = heapq.heappop(self._lines)
+            yield f"[{when:%a %b %d %H:%M:%S %Y}] {text}"
+
+
+def _run(bot, game, output, clock):
+    # Answer everything the bot does the way the game would, moving the clock
+    # forward to whatever happens next, until there's nothing left to do.
+    while True:
+        for line in game.lines():
+            bot.feed(line)
+        bot.process()
+        while output.commands:
+            _, command = output.commands.pop(0)
+            game.command(command)
+
+        upcoming = [d for d in [game.next_line(), bot.next_deadline()] if d]
+        if not upcoming:
+            break
+        clock.now = max(clock.now, min(upcoming))
+
+
+def bench_buffing(tmpdir, targets, planner):
+    # Half of the crowd are regulars, who we buff once, and then once their
+    # short buffs have worn off, they hail us again along with the other half,
+    # who are new and need everything. Only that second, mixed, crowd is timed,
+    # since it's where the order we cast in matters, the regulars don't need
+    # Aegolism again, so there's other work to do while its gem recovers.
+    clock = VirtualClock(datetime(2020, 10, 24, 20, 0, 0))
+    output = RecordingBackend(clock=clock)
+    game = SimulatedGame(clock, SPELLS)
+
+    filename = os.path.join(tmpdir, f"eqlog_{CHARACTER}_xegony.txt")
+    open(filename, "w").close()
+    bot = BuffBot(
+        filename=filename,
+        spells=SPELLS,
+        acls=[],
+        logger=lambda line: None,
+        clock=clock,
+        output=output,
+        focus=FakeFocus(True),
+        planner=planner,
+    )
+    bot.load()
+
+    regulars = [f"Regular{idx:04d}" for idx in range(targets // 2)]
+    newcomers = [f"Newcomer{idx:04d}" for idx in range(targets - len(regulars))]
+
+    for name in regulars:
+        game.say(clock.now, f"{name} says, 'Hail, {CHARACTER}'")
+    _run(bot, game, output, clock)
+
+    clock.now += timedelta(minutes=10)
+    game.buffed.clear()
+    bot.latency = LatencyTracker()
+    started = clock.now
+    for name in newcomers + regulars:
+        game.say(started, f"{name} says, 'Hail, {CHARACTER}'")
+    _run(bot, game, output, clock)
+
+    minutes = (clock.now - started).total_seconds() / 60
+    total = bot.latency.summary()["total"]
+    return {
+        "targets": targets,
+        "landed": len(game.buffed),
+        "minutes": minutes,
+        "buffs_per_minute": len(game.buffed) / minutes,
+        "wait_p50": total["p50"],
+        "wait_max": total["max"],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compare buffing in queue order against planned cast order."
+    )
+    parser.add_argument("--targets", type=int, default=20)
+    parser.add_argument("--horizon", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for name, planner in [
+            ("in order", None),
+            ("planned", CastPlanner(horizon=args.horizon)),
+        ]:
+            result = bench_buffing(tmpdir, args.targets, planner)
+            print(
+                f"{name:>10}: {result['landed']:,} buffs in "
+                f"{result['minutes']:.1f} min, "
+                f"{result['buffs_per_minute']:.1f} buffs/min, "
+                f"waited p50 {result['wait_p50']:.0f}s, "
+                f"max {result['wait_max']:.0f}s"
+            )
+
+
+if __name__ == "__main__":
+    main()
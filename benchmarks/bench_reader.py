@@ -0,0 +1,68 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(__file__), os.pardir, "src", "main", "python")
+)
+
+from bench_events import LINES  # noqa: E402
+
+from buffbot.core.tailer import LogTailer  # noqa: E402
+
+
+def _readline_reader(filename):
+    # The original reader, a text mode handle read one line at a time.
+    count = 0
+    with open(filename, encoding="utf8") as fp:
+        while line := fp.readline():
+            line = line.strip()
+            count += 1
+    return count
+
+
+def _tailer_reader(filename):
+    count = 0
+    tailer = LogTailer(filename)
+    tailer.open()
+    try:
+        for line in tailer.read_lines():
+            count += 1
+    finally:
+        tailer.close()
+    return count
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filename = os.path.join(tmpdir, "eqlog_Buffbot_xegony.txt")
+        with open(filename, "w", encoding="utf8") as fp:
+            for _ in range(50000):
+                for line in LINES:
+                    fp.write(f"[Sat Oct 24 03:34:26 2020] {line}\n")
+
+        for name, func in [("readline", _readline_reader), ("tailer", _tailer_reader)]:
+            best = None
+            for _ in range(5):
+                start = time.perf_counter()
+                count = func(filename)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            print(f"{name:>10}: {count / best:12,.0f} lines/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import os
+import random
+import sys
+
+from datetime import datetime, timedelta
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(__file__), os.pardir, "src", "main", "python")
+)
+
+from buffbot.core.types import Spell  # noqa: E402
+
+CHARACTER = "Buffbot"
+
+SPELLS = [
+    Spell(name="Aegolism", gem=1, success_message="{target} looks very healthy."),
+    Spell(name="Spirit of Wolf", gem=2, success_message="{target} runs like a wolf."),
+    Spell(name="Clarity", gem=3, success_message="{target} looks very tranquil."),
+]
+
+# The relative weight of each kind of line in the generated log, the defaults
+# are roughly what a buffer sitting in a busy raid sees, which is to say almost
+# entirely combat spam.
+DEFAULT_MIX = {
+    "combat": 950,
+    "hail": 10,
+    "cast": 10,
+    "success": 10,
+    "fizzle": 4,
+    "interrupt": 4,
+    "blocked": 4,
+    "not_take_hold": 4,
+    "misc": 4,
+}
+
+_MOBS = ["a gnoll pup", "a decaying skeleton", "an orc centurion", "a fire beetle"]
+_VERBS = ["hits", "slashes", "bashes", "kicks", "crushes", "pierces", "bites"]
+
+
+class LogGenerator:
+    def __init__(
+        self,
+        *,
+        character=CHARACTER,
+        spells=SPELLS,
+        mix=None,
+        sources=200,
+        lines_per_second=200,
+        start=datetime(2020, 10, 24, 20, 0, 0),
+        seed=0,
+    ):
+        self.character = character
+        self.spells = spells
+        self.mix = dict(DEFAULT_MIX if mix is None else mix)
+        self.sources = [f"Player{i:04d}".title() for i in range(sources)]
+        self.lines_per_second = lines_per_second
+        self.start = start
+
+        self._random = random.Random(seed)
+        self._kinds = list(self.mix)
+        self._weights = [self.mix[k] for k in self._kinds]
+
+    def lines(self, count):
+        rand = self._random
+        date = self.start
+        kinds = rand.choices(self._kinds, self._weights, k=count)
+        for idx, kind in enumerate(kinds):
+            if idx and idx % self.lines_per_second == 0:
+                date += timedelta(seconds=1)
+            yield f"[{date:%a %b %d %H:%M:%S %Y}] {getattr(self, '_' + kind)(rand)}"
+
+    def write(self, fp, count):
+        for line in self.lines(count):
+            fp.write(line)
+            fp.write("\n")
+
+    def _combat(self, rand):
+        mob = rand.choice(_MOBS)
+        who = rand.choice(self.sources)
+        damage = rand.randint(1, 400)
+        return rand.choice(
+            [
+                f"{mob.capitalize()} {rand.choice(_VERBS)} YOU for {damage} points "
+                "of damage.",
+                f"{who} {rand.choice(_VERBS)} {mob} for {damage} points of damage.",
+                f"{mob.capitalize()} tries to hit {who}, but misses!",
+                f"You slash {mob} for {damage} points of damage.",
+            ]
+        )
+
+    def _hail(self, rand):
+        return f"{rand.choice(self.sources)} says, 'Hail, {self.character}'"
+
+    def _cast(self, rand):
+        return f"You begin casting {rand.choice(self.spells).name}."
+
+    def _success(self, rand):
+        spell = rand.choice(self.spells)
+        return spell.success_message.format(target=rand.choice(self.sources))
+
+    def _fizzle(self, rand):
+        return f"Your {rand.choice(self.spells).name} spell fizzles!"
+
+    def _interrupt(self, rand):
+        return f"Your {rand.choice(self.spells).name} spell is interrupted."
+
+    def _blocked(self, rand):
+        spell = rand.choice(self.spells).name
+        return (
+            f"Your {spell} spell did not take hold on {rand.choice(self.sources)}. "
+            f"(Blocked by {spell}.)"
+        )
+
+    def _not_take_hold(self, rand):
+        return (
+            f"Your {rand.choice(self.spells).name} spell did not take hold on "
+            f"{rand.choice(self.sources)}."
+        )
+
+    def _misc(self, rand):
+        return rand.choice(
+            [
+                "Your target is out of range, get closer!",
+                "Insufficient Mana to cast this spell!",
+                "You must first select a target for this spell!",
+                f"{rand.choice(self.sources)} tells the guild, 'inc'",
+            ]
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Generate a synthetic EverQuest log file."
+    )
+    parser.add_argument("filename")
+    parser.add_argument("--lines", type=int, default=1_000_000)
+    parser.add_argument("--sources", type=int, default=200)
+    parser.add_argument("--lines-per-second", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    generator = LogGenerator(
+        sources=args.sources, lines_per_second=args.lines_per_second, seed=args.seed
+    )
+    with open(args.filename, "w", encoding="utf8") as fp:
+        generator.write(fp, args.lines)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import collections
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from datetime import datetime
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(__file__), os.pardir, "src", "main", "python")
+)
+
+from loggen import CHARACTER, SPELLS, LogGenerator  # noqa: E402
+
+from buffbot.core import BuffBot  # noqa: E402
+from buffbot.core.events import dispatcher  # noqa: E402
+from buffbot.core.output import RecordingBackend  # noqa: E402
+from buffbot.core.replay import VirtualClock  # noqa: E402
+from buffbot.core.utils import FakeFocus  # noqa: E402
+
+
+def _new_bot(filename, **kwargs):
+    kwargs.setdefault("output", RecordingBackend())
+    kwargs.setdefault("focus", FakeFocus(True))
+    return BuffBot(
+        filename=filename, spells=SPELLS, acls=[], logger=lambda line: None, **kwargs
+    )
+
+
+def _logfile(tmpdir):
+    filename = os.path.join(tmpdir, f"eqlog_{CHARACTER}_xegony.txt")
+    open(filename, "w").close()
+    return filename
+
+
+def bench_read(tmpdir, lines):
+    # Simulate tailing a live log, the bot is loaded against an empty file, then
+    # the whole log is written to it, and we time how long read() takes to get
+    # through it.
+    filename = _logfile(tmpdir)
+    bot = _new_bot(filename)
+    bot.load()
+    with open(filename, "a", encoding="utf8") as fp:
+        LogGenerator().write(fp, lines)
+
+    start = time.perf_counter()
+    bot.read()
+    elapsed = time.perf_counter() - start
+    bot.close()
+
+    return {"lines": lines, "seconds": elapsed, "lines_per_second": lines / elapsed}
+
+
+def bench_classify(lines):
+    # Group our lines by the event that they classify as, and then time the
+    # classification of each group on its own.
+    groups = collections.defaultdict(list)
+    for line in LogGenerator().lines(lines):
+        line = BuffBot._line_re.search(line).group("line")
+        event_type, _ = dispatcher.match(line)
+        groups[event_type.__name__].append(line)
+
+    results = {}
+    for name, group in sorted(groups.items()):
+        start = time.perf_counter_ns()
+        for line in group:
+            dispatcher.match(line)
+        elapsed = time.perf_counter_ns() - start
+        results[name] = {"lines": len(group), "ns_per_line": elapsed / len(group)}
+
+    return results
+
+
+def bench_process(tmpdir, targets):
+    # Queue up a crowd of people, and then drive the bot through buffing all of
+    # them, answering each action with the line that completes it, to measure
+    # how much time the core spends deciding what to do next.
+    clock = VirtualClock(datetime(2020, 10, 24, 20, 0, 0))
+    output = RecordingBackend(clock=clock)
+    current = output.commands
+    bot = _new_bot(_logfile(tmpdir), clock=clock, output=output)
+    bot.load()
+
+    stamp = f"[{clock.now:%a %b %d %H:%M:%S %Y}]"
+    for idx in range(targets):
+        bot.feed(f"{stamp} Player{idx:04d} says, 'Hail, {CHARACTER}'")
+
+    calls = 0
+    elapsed = 0.0
+    target = None
+    while True:
+        start = time.perf_counter()
+        bot.process()
+        elapsed += time.perf_counter() - start
+        calls += 1
+
+        if not current:
+            if (deadline := bot.next_deadline()) is None:
+                break
+            clock.now = max(clock.now, deadline)
+            continue
+
+        stamp = f"[{clock.now:%a %b %d %H:%M:%S %Y}]"
+        _, command = current.pop(0)
+        if command.startswith("/tar "):
+            target = command[5:]
+        elif command.startswith("/say "):
+            bot.feed(f"{stamp} You say, 'Hail, {target}'")
+        elif command.startswith("/cast "):
+            spell = SPELLS[int(command[6:]) - 1]
+            bot.feed(f"{stamp} You begin casting {spell.name}.")
+            bot.feed(f"{stamp} {spell.success_message.format(target=target)}")
+
+    return {
+        "targets": targets,
+        "calls": calls,
+        "seconds": elapsed,
+        "us_per_call": elapsed / calls * 1e6,
+    }
+
+
+def bench_memory(tmpdir, lines, batches):
+    # Feed a long log through read() in batches, like a long session would, and
+    # keep track of how much memory we're holding onto.
+    filename = _logfile(tmpdir)
+    bot = _new_bot(filename)
+    bot.load()
+
+    generator = LogGenerator(lines_per_second=50)
+    source = generator.lines(lines * batches)
+
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    samples = []
+    try:
+        with open(filename, "a", encoding="utf8") as fp:
+            for _ in range(batches):
+                for _, line in zip(range(lines), source):
+                    fp.write(line)
+                    fp.write("\n")
+                fp.flush()
+                bot.read()
+                samples.append(tracemalloc.get_traced_memory()[0] - baseline)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        bot.close()
+
+    return {
+        "lines": lines * batches,
+        "peak_bytes": peak - baseline,
+        "first_batch_bytes": samples[0],
+        "last_batch_bytes": samples[-1],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the BuffBot benchmarks.")
+    parser.add_argument("--lines", type=int, default=200_000)
+    parser.add_argument("--targets", type=int, default=1_000)
+    parser.add_argument("--batches", type=int, default=20)
+    parser.add_argument(
+        "--output", help="write the results as JSON to this file, instead of stdout"
+    )
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        results = {
+            "date": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "benchmarks": {
+                "read": bench_read(tmpdir, args.lines),
+                "classify": bench_classify(args.lines),
+                "process": bench_process(tmpdir, args.targets),
+                "memory": bench_memory(tmpdir, args.lines // 10, args.batches),
+            },
+        }
+
+    if args.output:
+        with open(args.output, "w", encoding="utf8") as fp:
+            json.dump(results, fp, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
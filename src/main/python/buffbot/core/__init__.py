@@ -1,6 +1,7 @@
 import functools
 import os
 import re
+import time
 import typing
 
 # Licensed under the Apache License, Version 2.0 (the "License");
@@ -15,19 +16,47 @@ import typing
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from datetime import datetime
-
-from boltons.setutils import IndexedSet
+from datetime import datetime, timedelta
 
+from .acl import ACL
 from .actions import Action, CastSpell, Target
-from .events import Event, Hail
-from .types import Character, Spell
-from .utils import shared_open, is_current_window
+from .buffqueue import BuffQueue, DropPolicy
+from .checkpoint import Checkpoint, CheckpointStore
+from .coordinator import CoordinatorClient
+from .events import (
+    Event,
+    GroupDisbanded,
+    GroupJoined,
+    GroupLeft,
+    Hail,
+    Line,
+    LinePrefilter,
+    SpellCast,
+    dispatcher,
+)
+from .expiry import BuffExpiry
+from .groups import GroupRoster
+from .latency import LatencyTracker
+from .metrics import Metrics
+from .output import OutputBackend, OutputThread, PasteBackend
+from .planner import CastPlanner
+from .scheduler import Deadlines
+from .tailer import LogTailer
+from .timestamps import TimestampParser
+from .timings import SpellTimings
+from .trace import Tracer
+from .types import Character, Spell, SpellScope
+from .utils import WindowFocus
 
 
 class BuffBot:
 
-    _line_re = re.compile(r"^\[(?P<date>[^\]]+)\]\s+(?P<line>.+)$")
+    _line_re = re.compile(r"^\s*\[(?P<date>[^\]]+)\]\s+(?P<line>.*\S)\s*$")
+
+    _action_timeout = timedelta(seconds=15)
+    _stale_timeout = timedelta(minutes=5)
+    _focus_retry = timedelta(seconds=1)
+    _claim_interval = timedelta(seconds=1)
 
     def __init__(
         self,
@@ -36,15 +65,71 @@ class BuffBot:
         spells: typing.List[Spell],
         acls: typing.List[str],
         logger=None,
+        checkpoint: typing.Optional[os.PathLike] = None,
+        catch_up: typing.Optional[timedelta] = None,
+        clock: typing.Callable[[], datetime] = datetime.now,
+        output: typing.Optional[OutputBackend] = None,
+        focus: typing.Optional[WindowFocus] = None,
+        refresh_margin: timedelta = timedelta(minutes=1),
+        queue_maxlen: typing.Optional[int] = None,
+        queue_policy: DropPolicy = DropPolicy.Newest,
+        coordinator: typing.Optional[CoordinatorClient] = None,
+        tracer: typing.Optional[Tracer] = None,
+        metrics: typing.Optional[Metrics] = None,
+        timings: typing.Optional[SpellTimings] = None,
+        planner: typing.Optional[CastPlanner] = None,
+        roster: typing.Optional[GroupRoster] = None,
     ):
         self.filename = filename
         self.spells = spells
         self.acls = acls
         self.logger = logger
+        self.catch_up = catch_up
+        self.refresh_margin = refresh_margin
+        self.clock = clock
+        self.tracer = tracer
+        self.metrics = metrics
+
+        # If we haven't been given somewhere to send our commands, then we'll
+        # send them to the game ourselves, from a thread of our own.
+        self._owns_output = output is None
+        self.output = (
+            output
+            if output is not None
+            else OutputThread(PasteBackend(), logger=self.logger, tracer=tracer)
+        )
+        self.focus = focus if focus is not None else WindowFocus("EverQuest")
 
         self.character = Character.from_filename(self.filename)
 
-        self._buff_queue = IndexedSet()
+        self._deadlines = Deadlines()
+        self._expiry = BuffExpiry()
+
+        self._buff_queue = BuffQueue(
+            maxlen=queue_maxlen, policy=queue_policy, on_drop=self._dropped
+        )
+        self._claimed: typing.Optional[str] = None
+        self._hailed: typing.Dict[str, datetime] = {}
+        self.latency = LatencyTracker()
+
+        # Rather than giving every spell the same timeout and recovery pause,
+        # we learn them for each spell from what we see in the log.
+        self.timings = timings if timings is not None else SpellTimings()
+        self._cast_started: typing.Optional[datetime] = None
+        self._last_cast: typing.Optional[typing.Tuple[str, datetime]] = None
+
+        # Without a planner, we buff one person at a time, casting their spells
+        # in the order they're configured in. With one, we plan across the
+        # front of the queue, keeping track of when each gem can be cast again.
+        self.planner = planner
+        self._gem_ready: typing.Dict[int, datetime] = {}
+
+        # A group spell only needs to be cast once for everyone in a group, so
+        # we keep track of who is grouped with who, and which spells people who
+        # are still waiting in the queue have already gotten from someone else's
+        # group cast.
+        self.roster = roster if roster is not None else GroupRoster()
+        self._covered: typing.Dict[str, typing.Set[str]] = {}
         self._current_target: typing.Optional[str] = None
         self._current_started: typing.Optional[datetime] = None
         self._current_action: typing.Optional[typing.Tuple[datetime, Action]] = None
@@ -53,6 +138,178 @@ class BuffBot:
 
         self._window_logged = False
 
+        self._parse_timestamp = TimestampParser()
+
+        # We don't open the log until we're loaded, which might never happen if
+        # something else failed to start first.
+        self._tailer: typing.Optional[LogTailer] = None
+
+        self._checkpoint = CheckpointStore(checkpoint) if checkpoint else None
+        self._checkpoint_saved = time.monotonic()
+
+        # When we're sharing a buff queue with other bots, the coordinator is
+        # who decides who we buff and with which spells, and we only fall back
+        # to our own buff queue if we can't reach it.
+        self.coordinator = coordinator
+        self._register()
+
+    # Each of the points in time that process() cares about is tracked in our
+    # deadlines as it's set, so that we always know the next time that
+    # process() will have something to do, without having to poll it.
+
+    @property
+    def _current_started(self) -> typing.Optional[datetime]:
+        return self.__current_started
+
+    @_current_started.setter
+    def _current_started(self, value: typing.Optional[datetime]):
+        self.__current_started = value
+        self._deadlines.set(
+            "stale", None if value is None else value + self._stale_timeout
+        )
+
+    @property
+    def _current_action(self) -> typing.Optional[typing.Tuple[datetime, Action]]:
+        return self.__current_action
+
+    @_current_action.setter
+    def _current_action(self, value: typing.Optional[typing.Tuple[datetime, Action]]):
+        self.__current_action = value
+        self._deadlines.set(
+            "timeout", None if value is None else value[0] + self._timeout(value[1])
+        )
+
+    def _timeout(self, action: Action) -> timedelta:
+        if isinstance(action, CastSpell):
+            return self.timings.timeout(action.spell.name, self._action_timeout)
+        return self._action_timeout
+
+    @property
+    def _pause_until(self) -> typing.Optional[datetime]:
+        return self.__pause_until
+
+    @_pause_until.setter
+    def _pause_until(self, value: typing.Optional[datetime]):
+        self.__pause_until = value
+        self._deadlines.set("pause", value)
+
+    def next_deadline(self) -> typing.Optional[datetime]:
+        # The next point in time at which process() needs to be called, or None
+        # if there is nothing for it to do until something new is read from the
+        # log.
+        return self._deadlines.next()
+
+    @property
+    def acls(self) -> typing.List[str]:
+        return self._acls
+
+    @acls.setter
+    def acls(self, acls: typing.List[str]):
+        # We compile the new ACL entirely before swapping it in, so that anything
+        # checking it always sees either the old one or the new one as a whole.
+        self._acl = ACL(acls)
+        self._acls = acls
+
+    @property
+    def spells(self) -> typing.List[Spell]:
+        return self._spells
+
+    @spells.setter
+    def spells(self, spells: typing.List[Spell]):
+        # The prefilter only depends on the success messages, so if those haven't
+        # changed, then there's no reason to rebuild it.
+        previous = getattr(self, "_spells", None)
+        self._spells = list(spells)
+        if previous is None or {s.success_message for s in previous} != {
+            s.success_message for s in spells
+        }:
+            self._prefilter = self._build_prefilter(self._spells)
+
+    def reconfigure(
+        self,
+        *,
+        spells: typing.Optional[typing.List[Spell]] = None,
+        acls: typing.Optional[typing.List[str]] = None,
+    ):
+        # Apply new spells and/or ACLs to the running bot, without losing where
+        # we are in the log, who is in the buff queue, or who we're currently in
+        # the middle of buffing.
+        if acls is not None and acls != self.acls:
+            self.acls = acls
+
+        if spells is None or spells == self.spells:
+            return
+
+        old = {s.name: s for s in self.spells}
+        new = {s.name: s for s in spells}
+        self.spells = spells
+
+        # Figure out who we're currently buffing, if anyone.
+        target = None
+        current = [self._current_action[1]] if self._current_action else []
+        for action in current + self._pending_actions[:1]:
+            if isinstance(action, (Target, CastSpell)):
+                target = action.target
+                break
+
+        # Any cast that is in flight, or still pending, for a spell that has been
+        # changed gets updated to use the new version of that spell, while any
+        # pending cast for a spell that has been removed is dropped. A cast that
+        # is already in flight is left alone to finish, or time out.
+        if self._current_action is not None:
+            action = self._current_action[1]
+            if isinstance(action, CastSpell) and action.spell.name in new:
+                action.spell = new[action.spell.name]
+
+        pending = []
+        for action in self._pending_actions:
+            if isinstance(action, CastSpell):
+                if action.spell.name not in new:
+                    continue
+                action.spell = new[action.spell.name]
+            pending.append(action)
+
+        # If we're in the middle of buffing someone, then they should get any
+        # spells that were just added too, though if we've planned to buff other
+        # people after them, we'll need to target them again first.
+        if target is not None and (
+            added := [
+                CastSpell(target=target, spell=spell)
+                for name, spell in new.items()
+                if name not in old
+            ]
+        ):
+            # That includes when there's nothing left to do at all, because all
+            # we had left was for spells that were just removed, in which case
+            # targeting them again is harmless if they're still our target.
+            remaining = current + pending
+            if not remaining or remaining[-1].target.lower() != target.lower():
+                pending.append(Target(target=target))
+            pending.extend(added)
+
+        self._pending_actions = pending
+        self._register()
+
+    def _register(self):
+        if self.coordinator is not None:
+            try:
+                self.coordinator.register([s.name for s in self.spells])
+            except OSError as e:
+                self.logger(f"Could not register with the coordinator: {e}")
+
+    @staticmethod
+    def _build_prefilter(spells):
+        # We're interested in any line that could be one of our events, other
+        # than a generic line, which we only care about if it could be the
+        # success message for one of our spells. Since the success message is
+        # a template, we use the longest piece of literal text in it.
+        literals = dispatcher.literals(exclude=(Line,))
+        if literals is not None:
+            for spell in spells:
+                literals.append(max(spell.success_message.split("{target}"), key=len))
+
+        return LinePrefilter(literals)
+
     def __repr__(self):
         return (
             f"<BuffBot (filename={self.filename!r}, "
@@ -60,7 +317,7 @@ class BuffBot:
         )
 
     def _check_and_log_window(self):
-        if is_current_window("EverQuest"):
+        if self.focus.focused:
             self._window_logged = False
             return True
         else:
@@ -72,96 +329,344 @@ class BuffBot:
             return False
 
     def load(self):
-        self._fp = shared_open(self.filename)
-        self._fp.seek(0, 2)
+        self.focus.refresh(force=True)
+
+        self._tailer = LogTailer(self.filename)
+        self._tailer.open(at_end=True)
+
+        # By default we start reading from the end of the log, but if we know
+        # where we left off, then we'll resume from there so that we don't miss
+        # anyone who hailed us while we weren't running.
+        #
+        # If we've been told to catch up on some amount of time, then we'll
+        # find where that starts and make sure not to start any earlier than
+        # that, so we don't try to buff people who hailed us hours ago.
+        offset = None
+        if self._checkpoint is not None:
+            checkpoint = self._checkpoint.load()
+            # If the line we last read isn't where we left it, then the log has
+            # been truncated, rotated or replaced since we saved the checkpoint,
+            # and its offset is meaningless.
+            if (
+                checkpoint is not None
+                and checkpoint.date is not None
+                and self._tailer.date_before(checkpoint.offset) == checkpoint.date
+            ):
+                offset = checkpoint.offset
+        if self.catch_up is not None:
+            earliest = self._tailer.find_offset(self.clock() - self.catch_up)
+            offset = earliest if offset is None else max(offset, earliest)
+
+        if offset is not None:
+            self._tailer.seek(offset)
 
     def reload(self):
-        self._fp.close()
-        self._fp = shared_open(self.filename)
+        self._tailer.reopen()
 
     def close(self):
-        self._fp.close()
+        if self._tailer is not None:
+            self._save_checkpoint(force=True)
+            self._tailer.close()
+
+        if self._owns_output:
+            self.output.close()
+        if self.coordinator is not None:
+            self._finish_claim()
+            self.coordinator.close()
+
+    def _save_checkpoint(self, *, force=False):
+        # We don't need to save our position after every read, just often enough
+        # that a restart doesn't throw away much.
+        now = time.monotonic()
+        if not force and now - self._checkpoint_saved < 5:
+            return
+        self._checkpoint_saved = now
+
+        if self._checkpoint is not None and self._tailer is not None:
+            offset = self._tailer.offset
+            self._checkpoint.save(
+                Checkpoint(offset=offset, date=self._tailer.date_before(offset))
+            )
+
+        # Anything new that we've learned about our spells gets saved along with
+        # it, so that we don't have to learn it all over again next time.
+        self.timings.save()
 
     def read(self):
+        # We sample which window is focused once per batch of lines, instead
+        # of once per line. If the focus changes part way through a batch, then
+        # the whole batch is handled as if it hadn't, and the next read will
+        # pick up the change.
+        self.focus.refresh()
+
         # First we go through, and process all of the lines that are currently,
         # in the log file.
-        while line := self._fp.readline():
-            line = line.strip()
-            if m := self._line_re.search(line):
-                date = datetime.strptime(m.group("date"), "%a %b %d %H:%M:%S %Y")
-                line = m.group("line")
-
-                # Parse the line into an event.
-                event = None
-                for event_type in Event.__subclasses__():
-                    if event := event_type.search(date, line):
-                        break
-
-                if event is not None:
-                    # If we have an action we're currently doing, then we will pass thid
-                    # event into the action, to let it see if it completes the action or
-                    # not.
-                    #
-                    # This can have three outcomes:
-                    # 1. True, the action should be deemed successful, and it's now
-                    #          finished.
-                    # 2. False, the action was a failure, and we should ask the action
-                    #           what to do.
-                    # 3. None, the event has no bearing on the success/failure of this
-                    #          action.
-                    if self._current_action is not None:
-                        if (result := self._current_action[1].check(event)) is not None:
-                            # Our action was unsucessful, so we'll have the action
-                            # itself decide what to do, since some actions might be
-                            # recoverable, while some may not be.
-                            if not result.ok:
-                                self._pending_actions = self._current_action[1].failed(
-                                    event, self._pending_actions, logger=self.logger
-                                )
-
-                            # If we've been given a pause, then we'll set a pause until
-                            # based off of that. This is going to use the datetime of
-                            # the current event, this will help reduce any additonal
-                            # waiting that might come around from lagging from when the
-                            # file was written to when it was actually read and
-                            # processed.
-                            if result.pause is not None:
-                                self._pause_until = event.date + result.pause
-
-                            # Regardless of if the action was succesful or not, the
-                            # current action is now complete, if the action was able
-                            # to be retried, then the action should have readded a
-                            # new event to our pending events.
-                            self._current_action = None
-
-                    # Finally, we'll handle this event on it's own as well, however
-                    # we'll only do this if the current window is an EverQuest windowm
-                    # otherwise we're going to just skip this event completely.
-                    if self._check_and_log_window():
-                        self._handle_event(event)
+        if self.tracer is None:
+            for line in self._read_lines():
+                self.feed(line)
+        else:
+            self._traced_read(self.tracer)
+
+        self._save_checkpoint()
+
+    def _traced_read(self, tracer: Tracer):
+        start = tracer.now()
+        for text in self._tailer.read_text():
+            tracer.record("read", start)
+            # Each chunk of text comes without its final newline.
+            if text:
+                tracer.count("lines.read", text.count("\n") + 1)
+
+            start = tracer.now()
+            lines = self.relevant_lines(text)
+            tracer.record("prefilter", start)
+            tracer.count("lines.relevant", len(lines))
+
+            for line in lines:
+                self.feed(line)
+            start = tracer.now()
+
+    def feed(self, line: str) -> typing.Optional[Event]:
+        if (tracer := self.tracer) is not None:
+            start = tracer.now()
+        if (metrics := self.metrics) is not None:
+            metrics.lines += 1
+
+        if (m := self._line_re.search(line)) is None:
+            return None
+
+        line = m.group("line")
+
+        # Generic lines are only ever looked at by an action that is
+        # currently in flight, so if we don't have one then the
+        # dispatcher can treat them as irrelevant, and we can skip
+        # parsing the timestamp and creating an event for them at all.
+        ignore = () if self._current_action is not None else (Line,)
+
+        # Classify the line, and only if it's something we care about,
+        # parse the date and turn it into an event.
+        event = None
+        matched = dispatcher.match(line, ignore=ignore)
+        if tracer is not None:
+            tracer.record("classify", start)
+
+        if matched is not None:
+            event_type, kwargs = matched
+            if tracer is not None:
+                start = tracer.now()
+                date = self._parse_timestamp(m.group("date"))
+                tracer.record("timestamp", start)
+                tracer.count(f"events.{event_type.__name__}")
+            else:
+                date = self._parse_timestamp(m.group("date"))
+            event = event_type(date=date, **kwargs)
+            if metrics is not None:
+                metrics.increment(metrics.events, event_type.__name__)
+
+        if event is not None:
+            if isinstance(event, SpellCast) and event.source.lower() == "you":
+                self._cast_seen(event)
+
+            # If we have an action we're currently doing, then we will pass thid
+            # event into the action, to let it see if it completes the action or
+            # not.
+            #
+            # This can have three outcomes:
+            # 1. True, the action should be deemed successful, and it's now
+            #          finished.
+            # 2. False, the action was a failure, and we should ask the action
+            #           what to do.
+            # 3. None, the event has no bearing on the success/failure of this
+            #          action.
+            if self._current_action is not None:
+                if tracer is not None:
+                    start = tracer.now()
+                    result = self._current_action[1].check(event)
+                    tracer.record("check", start)
+                else:
+                    result = self._current_action[1].check(event)
+
+                if result is not None:
+                    # How long it took, from sending the action's commands, to
+                    # hearing back about how it went.
+                    if tracer is not None:
+                        started, action = self._current_action
+                        tracer.observe(
+                            f"roundtrip.{type(action).__name__}",
+                            int((self.clock() - started).total_seconds() * 1e9),
+                        )
+
+                    # Our action was unsucessful, so we'll have the action
+                    # itself decide what to do, since some actions might be
+                    # recoverable, while some may not be.
+                    if not result.ok:
+                        if metrics is not None:
+                            metrics.increment(metrics.failures, type(event).__name__)
+                        self._pending_actions = self._failed(
+                            self._current_action[1], event
+                        )
+                    # If our spell landed, or was blocked by something that
+                    # already covers it, then we'll remember that they have it
+                    # so that we don't cast it again until it's wearing off.
+                    elif isinstance(self._current_action[1], CastSpell):
+                        action = self._current_action[1]
+                        self._expiry.landed(action.target, action.spell, event.date)
+                        if action.covers:
+                            self._credit_covers(action, event.date)
+                        if metrics is not None:
+                            metrics.increment(
+                                metrics.casts_succeeded,
+                                self._current_action[1].spell.name,
+                            )
+
+                    # If we've been given a pause, then we'll set a pause until
+                    # based off of that. This is going to use the datetime of
+                    # the current event, this will help reduce any additonal
+                    # waiting that might come around from lagging from when the
+                    # file was written to when it was actually read and
+                    # processed.
+                    pause = result.pause
+                    if isinstance(self._current_action[1], CastSpell):
+                        pause = self._cast_finished(
+                            self._current_action[1], event, result
+                        )
+                    if pause is not None:
+                        self._pause_until = event.date + pause
+
+                    self.latency.completed(
+                        self._current_action[1], event.date, result.ok
+                    )
+
+                    # Regardless of if the action was succesful or not, the
+                    # current action is now complete, if the action was able
+                    # to be retried, then the action should have readded a
+                    # new event to our pending events.
+                    self._current_action = None
+
+            # Finally, we'll handle this event on it's own as well, however
+            # we'll only do this if the current window is an EverQuest windowm
+            # otherwise we're going to just skip this event completely.
+            if self._check_and_log_window():
+                if tracer is not None:
+                    start = tracer.now()
+                    self._handle_event(event)
+                    tracer.record("handle_event", start)
+                else:
+                    self._handle_event(event)
+
+        return event
+
+    def _cast_seen(self, event: SpellCast):
+        # If this is the spell we're trying to cast, then we know when it
+        # started, and can time how long it takes to hear back about it.
+        action = self._current_action[1] if self._current_action else None
+        last, self._last_cast = self._last_cast, None
+        if not (isinstance(action, CastSpell) and action.spell.name == event.spell):
+            # Someone else started this cast, likely whoever is playing us, which
+            # could be any amount of time after our last one and tells us nothing
+            # about how long that spell takes to recover from.
+            return
+        self._cast_started = event.date
+        # When our next cast follows straight on from our last one, how soon it
+        # was able to start tells us how long that spell took to recover from.
+        # Anything longer than we'd ever pause for means something else held us
+        # up, so it isn't worth learning from.
+        if last is not None:
+            name, since = last
+            if (gap := event.date - since) <= self.timings.bounds.pause_max:
+                self.timings.recovered(name, gap)
+
+    def _cast_finished(
+        self, action: CastSpell, event: Event, result
+    ) -> typing.Optional[timedelta]:
+        pause = None
+        if result.pause is not None:
+            pause = self.timings.pause(action.spell.name, result.pause)
+
+        if self._cast_started is not None:
+            if result.ok:
+                self.timings.confirmed(
+                    action.spell.name, event.date - self._cast_started
+                )
+                if action.spell.recast is not None:
+                    self._gem_ready[action.spell.gem] = event.date + action.spell.recast
+            self._cast_started = None
+            # Our next cast can only ever start after however long we decided to
+            # pause, so we time it as if we'd paused for the spell's usual time
+            # instead, otherwise what we've learned would feed back into what we
+            # learn next, and only ever grow.
+            since = event.date
+            if pause is not None:
+                since += pause - result.pause
+            self._last_cast = action.spell.name, since
+
+        return pause
+
+    def _read_lines(self):
+        for text in self._tailer.read_text():
+            yield from self.relevant_lines(text)
+
+    def relevant_lines(self, text: str) -> typing.List[str]:
+        # The prefilter throws away every line that can't possibly be relevant
+        # to us before they ever reach the regex engine, which in a busy log is
+        # almost all of them.
+        return self._prefilter.lines(text)
 
     def process(self):
+        if (tracer := self.tracer) is None:
+            self._process()
+        else:
+            start = tracer.now()
+            self._process()
+            tracer.record("process", start)
+
+    def _do(self, action: Action):
+        self.latency.started(action, self.clock())
+
+        if (tracer := self.tracer) is None:
+            action.do(logger=self.logger, output=self.output)
+        else:
+            start = tracer.now()
+            action.do(logger=self.logger, output=self.output)
+            tracer.record("output.queue", start)
+            tracer.count(f"actions.{type(action).__name__}")
+
+        if (metrics := self.metrics) is not None and isinstance(action, CastSpell):
+            metrics.increment(metrics.casts_attempted, action.spell.name)
+            if (hailed := self._hailed.pop(action.target.casefold(), None)) is not None:
+                metrics.hail_to_cast.observe((self.clock() - hailed).total_seconds())
+
+    def _process(self):
+        # Any deadline that has passed is about to be dealt with, and anything
+        # that still needs to happen after this will set a new deadline.
+        self._deadlines.expire(self.clock())
+
+        # Forget about any buffs that have worn off.
+        self._expiry.evict(self.clock())
+
         # Check to see if our current action has been waiting for a confirmation for
         # too long, if it has, then we will just assume it completed or failed, but
         # either way we'll just keep going. The most likely case for this is a buff
         # block, which prevents any message from happening.
-        if (
-            self._current_action is not None
-            and (datetime.now() - self._current_action[0]).total_seconds() > 15
-        ):
+        if self._current_action is not None and self.clock() - self._current_action[
+            0
+        ] >= self._timeout(self._current_action[1]):
             # If we've reached the timeout, then we'll go ahead and ask the action
             # if we should retry, and if we should then we'll retry, and if we should
-            # not, then we'll clear out our current action and move on.
+            # not, then we'll clear out our current action and move on. Either way,
+            # whatever cast we were timing never finished, so forget about it.
+            self._cast_started = None
+            self._last_cast = None
             if self._current_action[1].retry(logger=self.logger):
-                self._current_action = datetime.now(), self._current_action[1]
-                self._current_action[1].do(logger=self.logger)
+                self._current_action = self.clock(), self._current_action[1]
+                self._do(self._current_action[1])
             else:
                 self._current_action = None
 
         # If we've been marked to pause, then we're going to stop processing at this
         # point, unlesss we've gone past our pause until point.
         if self._pause_until is not None:
-            if datetime.now() >= self._pause_until:
+            if self.clock() >= self._pause_until:
                 # We've reached our pause until, so clear it out.
                 self._pause_until = None
             else:
@@ -169,19 +674,45 @@ class BuffBot:
                 # iteration.
                 return
 
+        # If we've finished with our current target, then there's nothing left
+        # that can go stale, and we don't need to wake up to check for it.
+        if not (self._current_action or self._pending_actions):
+            self._current_started = None
+            self.latency.finish()
+            self._finish_claim()
+
         # Go through and start buffing people as needed.
-        if not (self._current_action or self._pending_actions) and self._buff_queue:
-            target = self._buff_queue.pop(0)
-            self._pending_actions.extend(
-                [Target(target=target)]
-                + [CastSpell(target=target, spell=s) for s in self.spells]
-            )
-            self._current_started = datetime.now()
+        if not (self._current_action or self._pending_actions) and (
+            requests := self._next_requests()
+        ):
+            now = self.clock()
+            covers = self._group_covers(requests)
+            if self.planner is None:
+                target, spells = requests[0]
+                actions = [Target(target=target)] + [
+                    CastSpell(target=target, spell=s) for s in spells
+                ]
+            else:
+                actions = self.planner.plan(
+                    requests,
+                    now=now,
+                    ready=self._gem_ready,
+                    cast_time=self._cast_time,
+                )
+            for action in actions:
+                if isinstance(action, CastSpell):
+                    action.covers = covers.get(
+                        (action.target.casefold(), action.spell.name), ()
+                    )
+            self._pending_actions.extend(actions)
+            self._current_started = now
 
         if self._current_action is None and self._pending_actions:
             # Before starting a new action, we're going to check to make sure that
             # the EverQuest window is the active window, and if not we're going to
-            # pause.
+            # pause. Since we're about to send keystrokes, we don't trust our
+            # cached focus here, and check again.
+            self.focus.refresh(force=True)
             if self._check_and_log_window():
                 # Because the EverQuest window could have been in the background
                 # for quite some time, it's possible that these pending actions
@@ -189,15 +720,232 @@ class BuffBot:
                 # our pending actions, and move onto trying to buff other people.
                 #
                 # In this case, we'll use a 5 minute timeout.
-                if (datetime.now() - self._current_started).total_seconds() >= 300:
+                if self.clock() - self._current_started >= self._stale_timeout:
                     self._current_started = None
                     self._pending_actions.clear()
                     self._buff_queue.clear()
+                    self._covered.clear()
+                    self._hailed.clear()
+                    self.latency.finish()
+                    self.latency.clear()
+                    self._finish_claim()
+                # If the next thing to do is cast a spell whose gem hasn't come off
+                # of its recast timer yet, then casting it now would just fail, so
+                # we'll wait for it instead.
+                elif (
+                    isinstance(action := self._pending_actions[0], CastSpell)
+                    and (ready := self._gem_ready.get(action.spell.gem)) is not None
+                    and ready > self.clock()
+                ):
+                    self._pause_until = ready
+                    # Waiting on the gem, rather than on recovering from our last
+                    # cast, says nothing about how long that took.
+                    self._last_cast = None
                 # Otherwise, our pending actions are fresh enough, and we can go ahead
                 # and process the next one.
                 else:
-                    self._current_action = datetime.now(), self._pending_actions.pop(0)
-                    self._current_action[1].do(logger=self.logger)
+                    self._current_action = self.clock(), self._pending_actions.pop(0)
+                    # A plan can cover several people, so how stale our pending
+                    # actions are is measured from when we started on whoever
+                    # we're buffing now, rather than from when we made the plan.
+                    if isinstance(self._current_action[1], Target):
+                        self._current_started = self._current_action[0]
+                        self._last_cast = None
+                    self._do(self._current_action[1])
+            # If EverQuest isn't the active window, then we have no way of knowing
+            # when it will be again, so we'll check back in a little bit.
+            else:
+                self._deadlines.set("focus", self.clock() + self._focus_retry)
+
+        if self.metrics is not None:
+            self.metrics.queue_depth = len(self._buff_queue)
+
+        # Other bots hear hails that we don't, so while we're idle we need to
+        # check back with the coordinator every so often for more work.
+        if self.coordinator is not None:
+            self._deadlines.set(
+                "claim",
+                None
+                if self._current_action or self._pending_actions
+                else self.clock() + self._claim_interval,
+            )
+
+    def _next_requests(self) -> typing.List[typing.Tuple[str, typing.List[Spell]]]:
+        # Pull the next people to buff off of the queue, along with the spells
+        # they need, skipping over any spells that they still have from the last
+        # time we buffed them, and anyone who still has all of them. A planner
+        # gets to plan for several people at once, unless we're sharing our
+        # queue, in which case we only ever take one person at a time.
+        limit = (
+            self.planner.horizon
+            if self.planner is not None and self.coordinator is None
+            else 1
+        )
+
+        requests = []
+        while len(requests) < limit and (claim := self._next_target()) is not None:
+            target, names = claim
+            now = self.clock()
+            covered = self._covered.pop(target.casefold(), set())
+            spells = [
+                s
+                for s in self.spells
+                if (names is None or s.name in names)
+                and s.name not in covered
+                and not self._expiry.active(target, s, now, margin=self.refresh_margin)
+            ]
+            if not spells:
+                self.logger(f"Not buffing {target}, their buffs are still active.")
+                self._forget(target)
+                self._finish_claim()
+                continue
+
+            requests.append((target, spells))
+
+        return requests
+
+    def _group_covers(
+        self, requests: typing.List[typing.Tuple[str, typing.List[Spell]]]
+    ) -> typing.Dict[typing.Tuple[str, str], typing.Tuple[str, ...]]:
+        # A group spell cast on one person lands on everyone in their group, so
+        # the first person we're about to buff with a group spell gets it cast
+        # on them, and that cast covers everyone else in their group, whether
+        # we're about to buff them too, or they're still waiting in the queue.
+        # Nobody loses their own cast of it until the covering cast has landed,
+        # so if it doesn't land, they still get it themselves.
+        covers = {}
+        covering: typing.Set[typing.Tuple[str, str]] = set()
+        for idx, (target, spells) in enumerate(requests):
+            later = [t for t, _ in requests[idx + 1 :]]
+            for spell in spells:
+                if spell.scope is not SpellScope.Group:
+                    continue
+                if (target.casefold(), spell.name) in covering:
+                    continue
+                if covered := self.roster.covered(
+                    target, later + list(self._buff_queue)
+                ):
+                    covers[target.casefold(), spell.name] = tuple(covered)
+                    covering.update((name.casefold(), spell.name) for name in covered)
+
+        return covers
+
+    def _credit_covers(self, action: CastSpell, date: datetime):
+        # Everyone else that a group spell landed on has it now too. Anyone that
+        # we were about to cast it on ourselves no longer needs that cast, and
+        # anyone still waiting in the queue will have it skipped for them once
+        # they come up.
+        keys = set()
+        for name in action.covers:
+            self._expiry.landed(name, action.spell, date)
+            if name in self._buff_queue:
+                self._covered.setdefault(name.casefold(), set()).add(action.spell.name)
+            keys.add(name.casefold())
+
+        # Working backwards, we drop the casts that are now covered, along with
+        # targeting anyone who no longer has anything left after it.
+        pending: typing.List[Action] = []
+        for pending_action in reversed(self._pending_actions):
+            key = pending_action.target.casefold()
+            if (
+                isinstance(pending_action, CastSpell)
+                and pending_action.spell.name == action.spell.name
+                and key in keys
+            ):
+                continue
+            if isinstance(pending_action, Target) and not (
+                pending and pending[-1].target.casefold() == key
+            ):
+                # If that was everything we had left to do for them, then we're
+                # done with them, without ever having to target them.
+                if not any(a.target.casefold() == key for a in pending):
+                    self.logger(
+                        f"Not buffing {pending_action.target}, "
+                        f"{action.target}'s {action.spell.name} covered them."
+                    )
+                    self._forget(pending_action.target)
+                continue
+            pending.append(pending_action)
+        self._pending_actions = pending[::-1]
+
+    def _cast_time(self, spell: Spell) -> timedelta:
+        if (typical := self.timings.typical(spell.name)) is not None:
+            return typical
+        return self.planner.cast_time
+
+    def _failed(self, action: Action, event: Event) -> typing.List[Action]:
+        # Actions only know about giving up on the person they're for, so when
+        # our pending actions are for more than one person, we only let them
+        # give up on the actions for that person.
+        target = action.target.lower()
+        result = action.failed(event, self._pending_actions, logger=self.logger)
+        if not result:
+            result = [a for a in self._pending_actions if a.target.lower() != target]
+
+        return result
+
+    def _next_target(
+        self,
+    ) -> typing.Optional[typing.Tuple[str, typing.Optional[typing.List[str]]]]:
+        # Figure out who we should buff next, and with what, where None means
+        # every spell that we have.
+        if self.coordinator is not None:
+            try:
+                if (claim := self.coordinator.claim()) is not None:
+                    target, names, hailed = claim
+                    self._claimed = target
+                    # Whoever claims someone is the one who times how long they
+                    # waited, from when they first hailed any of us.
+                    if hailed is not None:
+                        self._forget(target)
+                        self._remember_hail(target, hailed)
+                    return target, names
+            except OSError:
+                pass
+
+        if self._buff_queue:
+            return self._buff_queue.pop(), None
+
+        return None
+
+    def _finish_claim(self):
+        if self._claimed is not None:
+            target, self._claimed = self._claimed, None
+            try:
+                self.coordinator.done(target)
+            except OSError:
+                pass
+
+    def _remember_hail(self, name: str, date: datetime):
+        # Remember when they first hailed us, so that we can tell how long it
+        # took before we started, and then finished, buffing them.
+        self.latency.hailed(name, date)
+        if self.metrics is not None:
+            self._hailed.setdefault(name.casefold(), date)
+
+    def _forget(self, name: str):
+        # Whenever someone is dropped without being buffed, then we need to
+        # forget when they hailed us, otherwise the next time they hail us, we
+        # would time them from this hail instead.
+        self._hailed.pop(name.casefold(), None)
+        self.latency.forget(name)
+
+    def _dropped(self, name: str):
+        self.logger(f"Dropped {name} from the buff queue to make room.")
+        self._forget(name)
+
+    def _buffing(self, name: str) -> bool:
+        name = name.lower()
+        current = [self._current_action[1]] if self._current_action else []
+        for action in current + self._pending_actions:
+            if isinstance(action, (Target, CastSpell)):
+                if action.target.lower() == name:
+                    return True
+            if isinstance(action, CastSpell):
+                if any(covered.lower() == name for covered in action.covers):
+                    return True
+
+        return False
 
     @functools.singledispatchmethod
     def _handle_event(self, event):
@@ -214,19 +962,49 @@ class BuffBot:
             # is targeting. If they are, then this person is currently being
             # buffed, and shouldn't be added back to the buff queue to buff
             # again.
-            if (
-                self._current_action is not None
-                and isinstance(self._current_action[1], (Target, CastSpell))
-                and self._current_action[1].target.lower() == event.source.lower()
-            ):
+            #
+            # The same goes for anyone who is going to be covered by a group
+            # spell that we're casting on someone else in their group, since
+            # they're still waiting in the queue for anything else they need.
+            if self._buffing(event.source):
                 return
-            elif (
-                self._pending_actions
-                and isinstance(self._pending_actions[0], (Target, CastSpell))
-                and self._pending_actions[0].target.lower() == event.source.lower()
-            ):
+
+            # Make sure that this person is someone we're allowed to buff, and
+            # figure out where in the queue they should go.
+            if not (access := self._acl.check(event.source)).allowed:
+                self.logger(f"Not buffing {event.source}, they are not allowed.")
                 return
 
+            # If we're sharing a buff queue with other bots, then they go into
+            # that queue, where the coordinator will make sure that they only
+            # get buffed once, no matter how many of us they've hailed. We don't
+            # remember the hail ourselves, since another bot might be the one
+            # to claim them, and the coordinator tells whoever does when it was.
+            if self.coordinator is not None:
+                try:
+                    self.coordinator.hail(event.source, access.tier, event.date)
+                except OSError as e:
+                    self.logger(f"Could not reach the coordinator: {e}")
+                else:
+                    return
+
             # If wer're here, then there's no reason not to go ahead and add
             # this person to our buff queue.
-            self._buff_queue.add(event.source)
+            if self._buff_queue.push(event.source, access.tier):
+                self._remember_hail(event.source, event.date)
+            else:
+                self.logger(f"Not buffing {event.source}, the buff queue is full.")
+            if self.metrics is not None:
+                self.metrics.queue_depth = len(self._buff_queue)
+
+    @_handle_event.register
+    def _(self, event: GroupJoined):
+        self.roster.joined(event.member)
+
+    @_handle_event.register
+    def _(self, event: GroupLeft):
+        self.roster.left(event.member)
+
+    @_handle_event.register
+    def _(self, event: GroupDisbanded):
+        self.roster.disbanded()
@@ -0,0 +1,121 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import annotations
+
+import re
+import typing
+
+import attr
+
+# The priority tiers that people are queued in, lower tiers are buffed first.
+VIP_TIER = 0
+DEFAULT_TIER = 1
+
+
+@attr.s(slots=True, auto_attribs=True, frozen=True)
+class Access:
+
+    allowed: bool
+    tier: int = attr.ib(default=DEFAULT_TIER)
+
+
+_DENIED = Access(allowed=False)
+_VIP = Access(allowed=True, tier=VIP_TIER)
+_ALLOWED = Access(allowed=True)
+
+
+class ACL:
+    # Each entry is a character name, optionally prefixed with:
+    #
+    #   ! to deny them.
+    #   + to mark them as a VIP, who is allowed and buffed before anyone else.
+    #
+    # Names may contain the wildcards * and ?, so "Bob*" matches anyone whose
+    # name starts with Bob. Names are matched case insensitively, and an exact
+    # name always takes precedence over a wildcard, so "+Bob" makes Bob a VIP
+    # even with "!B*". Between entries that are both exact, or both wildcards,
+    # a denial wins, and then a VIP.
+    #
+    # If there are any plain entries, then only the people they match will be
+    # buffed, otherwise everyone who isn't denied will be.
+
+    _kinds = {"deny": _DENIED, "vip": _VIP, "allow": _ALLOWED}
+
+    def __init__(self, entries: typing.Iterable[str]):
+        self.entries = list(entries)
+
+        exact: typing.Dict[str, typing.Set[str]] = {"deny": set(), "vip": set()}
+        exact["allow"] = set()
+        patterns: typing.Dict[str, typing.List[str]] = {k: [] for k in exact}
+
+        for entry in self.entries:
+            entry = entry.strip()
+            if entry.startswith("!"):
+                kind, entry = "deny", entry[1:].strip()
+            elif entry.startswith("+"):
+                kind, entry = "vip", entry[1:].strip()
+            else:
+                kind = "allow"
+
+            if not entry:
+                continue
+
+            entry = entry.casefold()
+            if "*" in entry or "?" in entry:
+                patterns[kind].append(
+                    "".join(
+                        ".*" if c == "*" else "." if c == "?" else re.escape(c)
+                        for c in entry
+                    )
+                )
+            else:
+                exact[kind].add(entry)
+
+        self._deny = exact["deny"]
+        self._vip = exact["vip"]
+        self._allow = exact["allow"]
+        self._restricted = bool(exact["allow"] or patterns["allow"])
+
+        # All of our wildcard entries are compiled into a single pattern, with
+        # denials first so that they win if more than one kind matches.
+        alternatives = [
+            f"(?P<{kind}>{'|'.join(patterns[kind])})"
+            for kind in ["deny", "vip", "allow"]
+            if patterns[kind]
+        ]
+        self._patterns = re.compile("|".join(alternatives)) if alternatives else None
+
+    def __repr__(self):
+        return f"<ACL (entries={self.entries!r})>"
+
+    def __eq__(self, other):
+        if not isinstance(other, ACL):
+            return NotImplemented
+        return self.entries == other.entries
+
+    def check(self, name: str) -> Access:
+        key = name.casefold()
+
+        # Exact names are just set lookups, no matter how many we have, and are
+        # more specific than any wildcard, so they're checked first.
+        if key in self._deny:
+            return _DENIED
+        if key in self._vip:
+            return _VIP
+        if key in self._allow:
+            return _ALLOWED
+
+        if self._patterns is not None and (m := self._patterns.fullmatch(key)):
+            return self._kinds[m.lastgroup]
+
+        return _DENIED if self._restricted else _ALLOWED
@@ -17,7 +17,6 @@ import attr
 
 from . import events
 from .types import Spell
-from .utils import write_command
 
 
 @attr.s(slots=True, frozen=True, auto_attribs=True)
@@ -32,11 +31,13 @@ class Action:
         super().__init_subclass__(**kwargs)
         cls._commands = commands
 
-    def do(self, *, logger):
+    def do(self, *, logger, output):
         self.log(logger)
 
-        for command in self._commands:
-            write_command(command.format(**attr.asdict(self)))
+        # All of our commands are handed over at once, so that they get sent to
+        # the game as a single burst.
+        fields = attr.asdict(self)
+        output.send([command.format(**fields) for command in self._commands])
 
     def check(self, event) -> typing.Optional[Result]:
         raise NotImplementedError
@@ -96,14 +97,28 @@ class CastSpell(Action, Retryable, commands=["/cast {spell[gem]}"]):
     target: str
     spell: Spell
 
+    # Anyone else who is going to get this spell too, because it's a group spell
+    # and they're grouped with our target.
+    covers: typing.Tuple[str, ...] = attr.ib(default=())
+
+    # How many times we'll recast after a fizzle, interruption, or running out
+    # of mana, before giving up on this spell.
+    _recasts = 3
+
     def log(self, logger):
-        logger(f"Buffing {self.target} with {self.spell.name}.")
+        if self.covers:
+            logger(
+                f"Buffing {self.target} with {self.spell.name}, "
+                f"along with {', '.join(self.covers)}."
+            )
+        else:
+            logger(f"Buffing {self.target} with {self.spell.name}.")
 
     def check(self, event) -> typing.Optional[Result]:
         if self._check_started(event):
             self.started()
 
-        if ok := self._check(event):
+        if (ok := self._check(event)) is not None:
             return Result(ok=ok, pause=datetime.timedelta(seconds=2))
         return None
 
@@ -138,14 +153,17 @@ class CastSpell(Action, Retryable, commands=["/cast {spell[gem]}"]):
         elif isinstance(event, events.Line):
             if self.spell.success_message.format(target=self.target) == event.line:
                 return True
+        # Fizzles and interruptions tell us which spell they were for, and
+        # we only care about them if it was our spell.
+        elif isinstance(event, (events.SpellInterrupted, events.SpellFizzle)):
+            if event.spell == self.spell.name:
+                return False
         # These failures don't require any additional logic, if we get
         # these events, then we know it's a failure.
         elif isinstance(
             event,
             (
                 events.OutOfRange,
-                events.SpellInterrupted,
-                events.SpellFizzle,
                 events.InsufficientMana,
                 events.NoTarget,
             ),
@@ -167,7 +185,7 @@ class CastSpell(Action, Retryable, commands=["/cast {spell[gem]}"]):
         ):
             logger(
                 f"Could not buff {self.target} with {self.spell.name} "
-                f"({event.__class__.__name__}"
+                f"({event.__class__.__name__})"
             )
             return []
         # If our spell was interrupted for some reason, then we'll go
@@ -175,11 +193,21 @@ class CastSpell(Action, Retryable, commands=["/cast {spell[gem]}"]):
         #
         # Insufficient mana is a recoverable failure, so we'll recast
         # and see if it works this time.
+        #
+        # Either way, we only do that so many times, after which we'll give
+        # up on this spell, and move on to anything else we had left to do.
         elif isinstance(
             event,
             (events.SpellInterrupted, events.SpellFizzle, events.InsufficientMana),
         ):
-            return [self] + pending_events
+            if self._recasts:
+                self._recasts -= 1
+                return [self] + pending_events
+            logger(
+                f"Giving up on buffing {self.target} with {self.spell.name} "
+                f"({event.__class__.__name__})"
+            )
+            return pending_events
         # If we get here, then something is wrong, so we'll just hard
         # error.
         else:
@@ -0,0 +1,128 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import bisect
+import collections
+import enum
+import typing
+
+
+class DropPolicy(enum.Enum):
+    # When the queue is full, refuse anyone new.
+    Newest = "newest"
+    # When the queue is full, make room for someone new by dropping whoever was
+    # most recently queued at the lowest priority, as long as that's a lower
+    # priority than the person being added.
+    Lowest = "lowest"
+
+
+class BuffQueue:
+    def __init__(
+        self,
+        *,
+        maxlen: typing.Optional[int] = None,
+        policy: DropPolicy = DropPolicy.Newest,
+        on_drop: typing.Optional[typing.Callable[[str], None]] = None,
+    ):
+        self.maxlen = maxlen
+        self.policy = policy
+
+        # Called with the name of anyone who gets pushed out of the queue to
+        # make room for someone in a higher tier.
+        self.on_drop = on_drop
+
+        # Each priority tier has its own first in, first out queue of people,
+        # keyed by their case folded name, and we keep a sorted list of the
+        # tiers that currently have anyone in them. Lower tiers go first.
+        #
+        # We also keep track of which tier each person is in, so that checking
+        # if someone is queued, or removing them, doesn't have to look at every
+        # tier.
+        self._tiers: typing.Dict[int, collections.OrderedDict] = {}
+        self._order: typing.List[int] = []
+        self._members: typing.Dict[str, int] = {}
+
+    def __repr__(self):
+        return f"<BuffQueue ({list(self)!r})>"
+
+    def __len__(self):
+        return len(self._members)
+
+    def __bool__(self):
+        return bool(self._members)
+
+    def __contains__(self, name: str):
+        return name.casefold() in self._members
+
+    def __iter__(self) -> typing.Iterator[str]:
+        for tier in self._order:
+            yield from self._tiers[tier].values()
+
+    def push(self, name: str, tier: int = 0) -> bool:
+        # Returns whether or not this person is in the queue afterwards. If they
+        # were already queued, then they keep their existing spot.
+        key = name.casefold()
+        if key in self._members:
+            return True
+
+        if self.maxlen is not None and len(self._members) >= self.maxlen:
+            if (
+                self.policy is DropPolicy.Lowest
+                and self._order
+                and self._order[-1] > tier
+            ):
+                lowest = self._tiers[self._order[-1]]
+                dropped, dropped_name = lowest.popitem(last=True)
+                self._discard(dropped, self._order[-1])
+                if self.on_drop is not None:
+                    self.on_drop(dropped_name)
+            else:
+                return False
+
+        if (people := self._tiers.get(tier)) is None:
+            people = self._tiers[tier] = collections.OrderedDict()
+            bisect.insort(self._order, tier)
+        people[key] = name
+        self._members[key] = tier
+
+        return True
+
+    def pop(self) -> str:
+        if not self._order:
+            raise IndexError("pop from an empty BuffQueue")
+
+        tier = self._order[0]
+        key, name = self._tiers[tier].popitem(last=False)
+        self._discard(key, tier)
+
+        return name
+
+    def remove(self, name: str) -> bool:
+        key = name.casefold()
+        if (tier := self._members.get(key)) is None:
+            return False
+
+        del self._tiers[tier][key]
+        self._discard(key, tier)
+
+        return True
+
+    def clear(self):
+        self._tiers.clear()
+        self._order.clear()
+        self._members.clear()
+
+    def _discard(self, key: str, tier: int):
+        del self._members[key]
+        if not self._tiers[tier]:
+            del self._tiers[tier]
+            self._order.remove(tier)
@@ -0,0 +1,69 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import annotations
+
+import json
+import os
+import typing
+
+from datetime import datetime
+
+import attr
+
+
+@attr.s(slots=True, auto_attribs=True, frozen=True)
+class Checkpoint:
+
+    offset: int
+    date: typing.Optional[datetime] = attr.ib(default=None)
+
+
+class CheckpointStore:
+    def __init__(self, filename: os.PathLike):
+        self.filename = filename
+
+    def __repr__(self):
+        return f"<CheckpointStore (filename={self.filename!r})>"
+
+    def load(self) -> typing.Optional[Checkpoint]:
+        # A missing or corrupt checkpoint just means that we don't know where we
+        # left off, which isn't an error, we'll just start as if we never had
+        # one.
+        try:
+            with open(self.filename, encoding="utf8") as fp:
+                data = json.load(fp)
+            return Checkpoint(
+                offset=int(data["offset"]),
+                date=(
+                    datetime.fromisoformat(data["date"])
+                    if data.get("date") is not None
+                    else None
+                ),
+            )
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def save(self, checkpoint: Checkpoint):
+        data = {
+            "offset": checkpoint.offset,
+            "date": checkpoint.date.isoformat() if checkpoint.date else None,
+        }
+
+        # Write to a temporary file and then move it into place, so that if we
+        # die halfway through writing, we still have the old checkpoint rather
+        # than a truncated one.
+        os.makedirs(os.path.dirname(os.path.abspath(self.filename)), exist_ok=True)
+        tmp = f"{self.filename}.tmp"
+        with open(tmp, "w", encoding="utf8") as fp:
+            json.dump(data, fp)
+        os.replace(tmp, self.filename)
@@ -0,0 +1,377 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import itertools
+import json
+import os
+import queue
+import socket
+import socketserver
+import threading
+import time
+import typing
+
+from datetime import datetime
+
+import attr
+
+
+@attr.s(slots=True, auto_attribs=True)
+class Job:
+
+    target: str
+    tier: int
+    sequence: int
+    # When they first hailed any of us, for whoever ends up buffing them to time
+    # how long they waited.
+    hailed: typing.Optional[str] = attr.ib(default=None)
+    done: typing.Set[str] = attr.ib(factory=set)
+    claims: typing.Dict[int, typing.Set[str]] = attr.ib(factory=dict)
+
+    def claimed(self) -> typing.Set[str]:
+        return set().union(*self.claims.values())
+
+
+class WorkQueue:
+    def __init__(self, *, dedupe_window: float = 30.0, clock=time.monotonic):
+        self.dedupe_window = dedupe_window
+        self.clock = clock
+
+        # Every buffer registers the spells that it can cast, and a hail turns
+        # into a job that lasts until every spell that any of our buffers can
+        # cast has landed (or failed), so that however many of our buffers are
+        # hailed by the same person, they only get buffed once.
+        self._capabilities: typing.Dict[int, typing.Set[str]] = {}
+        self._jobs: typing.Dict[str, Job] = {}
+        self._finished: typing.Dict[str, float] = {}
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"<WorkQueue (jobs={len(self._jobs)!r})>"
+
+    def __len__(self):
+        return len(self._jobs)
+
+    def register(self, client: int, spells: typing.Iterable[str]):
+        with self._lock:
+            self._capabilities[client] = set(spells)
+            self._complete_finished()
+
+    def unregister(self, client: int):
+        # Anything that this buffer had claimed, but not finished, goes back up
+        # for grabs, and it's spells are no longer needed by anyone new.
+        with self._lock:
+            self._capabilities.pop(client, None)
+            for job in self._jobs.values():
+                job.claims.pop(client, None)
+            self._complete_finished()
+
+    def hail(self, target: str, tier: int, hailed: typing.Optional[str] = None) -> bool:
+        key = target.casefold()
+        with self._lock:
+            if (job := self._jobs.get(key)) is not None:
+                # Hailing more than one of us, or hailing the same one of us over
+                # and over, doesn't get anyone buffed twice, but it does get them
+                # the best spot in line that any of those hails would have.
+                job.tier = min(job.tier, tier)
+                if job.hailed is None:
+                    job.hailed = hailed
+                return False
+
+            if (finished := self._finished.get(key)) is not None:
+                if self.clock() - finished < self.dedupe_window:
+                    return False
+                del self._finished[key]
+
+            self._jobs[key] = Job(
+                target=target, tier=tier, sequence=next(self._sequence), hailed=hailed
+            )
+            return True
+
+    def claim(
+        self, client: int
+    ) -> typing.Optional[typing.Tuple[str, typing.List[str], typing.Optional[str]]]:
+        # Give this buffer the next person in line that still needs something
+        # it can cast, along with every one of those spells that nobody else is
+        # already casting on them. An idle buffer takes the next job rather
+        # than helping with one that is already underway, which is what lets
+        # more buffers buff more people at once.
+        with self._lock:
+            capabilities = self._capabilities.get(client, set())
+            for job in sorted(self._jobs.values(), key=lambda j: (j.tier, j.sequence)):
+                if client in job.claims:
+                    continue
+                if spells := capabilities - job.done - job.claimed():
+                    job.claims[client] = spells
+                    return job.target, sorted(spells), job.hailed
+
+        return None
+
+    def done(self, client: int, target: str):
+        with self._lock:
+            if (job := self._jobs.get(target.casefold())) is not None:
+                job.done |= job.claims.pop(client, set())
+                self._complete_finished()
+
+    def _complete_finished(self):
+        needed = set().union(*self._capabilities.values())
+        for key, job in list(self._jobs.items()):
+            if not job.claims and needed <= job.done:
+                del self._jobs[key]
+                self._finished[key] = self.clock()
+
+        # We only need to remember who we've finished with for as long as we'd
+        # ignore them hailing us again.
+        cutoff = self.clock() - self.dedupe_window
+        for key, finished in list(self._finished.items()):
+            if finished < cutoff:
+                del self._finished[key]
+
+
+# The protocol is newline delimited JSON, with each request being answered by a
+# single response.
+#
+#   {"op": "register", "spells": ["Aegolism", ...]}  -> {"ok": true}
+#   {"op": "hail", "target": "Soandso", "tier": 1,
+#    "hailed": "2020-10-24T03:00:00"}                -> {"queued": true}
+#   {"op": "claim"}       -> {"target": ..., "spells": [...], "hailed": ...}
+#   {"op": "done", "target": "Soandso"}              -> {"ok": true}
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        queue = self.server.queue
+        client = id(self)
+        try:
+            for line in self.rfile:
+                request = json.loads(line)
+                if (op := request.get("op")) == "register":
+                    queue.register(client, request["spells"])
+                    response = {"ok": True}
+                elif op == "hail":
+                    queued = queue.hail(
+                        request["target"], request.get("tier", 1), request.get("hailed")
+                    )
+                    response = {"queued": queued}
+                elif op == "claim":
+                    if (claim := queue.claim(client)) is None:
+                        response = {"target": None, "spells": [], "hailed": None}
+                    else:
+                        target, spells, hailed = claim
+                        response = {
+                            "target": target,
+                            "spells": spells,
+                            "hailed": hailed,
+                        }
+                elif op == "done":
+                    queue.done(client, request["target"])
+                    response = {"ok": True}
+                else:
+                    response = {"error": f"unknown op {op!r}"}
+
+                self.wfile.write(json.dumps(response).encode("utf8") + b"\n")
+        finally:
+            queue.unregister(client)
+
+
+# Unix sockets aren't available everywhere, most notably not on Windows, and
+# there the coordinator just isn't available, while the client fails like any
+# other coordinator that we can't reach.
+if hasattr(socket, "AF_UNIX"):
+
+    class CoordinatorServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+
+        daemon_threads = True
+
+        def __init__(self, path: str, *, dedupe_window: float = 30.0):
+            # A socket left behind by a coordinator that didn't shut down cleanly
+            # would stop us from binding.
+            if os.path.exists(path):
+                os.unlink(path)
+
+            self.queue = WorkQueue(dedupe_window=dedupe_window)
+            super().__init__(path, _Handler)
+
+        def server_close(self):
+            super().server_close()
+            if os.path.exists(self.server_address):
+                os.unlink(self.server_address)
+
+
+class CoordinatorClient:
+    def __init__(self, path: str, *, timeout: float = 1.0, retry: float = 5.0):
+        self.path = path
+        self.timeout = timeout
+        self.retry = retry
+
+        self._spells: typing.Optional[typing.List[str]] = None
+        self._sock = None
+        self._file = None
+
+        # Talking to the coordinator can block for as long as our timeout if
+        # it's stalled, and every bot that shares it would stall along with it,
+        # so we make our requests from a thread of our own and never wait on
+        # them. The only answer we need is to a claim, which is left for the bot
+        # to pick up the next time it asks.
+        self._lock = threading.Lock()
+        self._error: typing.Optional[OSError] = None
+        self._retry_at = 0.0
+        self._claiming = False
+        self._claim: typing.Optional[
+            typing.Tuple[str, typing.List[str], typing.Optional[datetime]]
+        ] = None
+
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = threading.Thread(
+            target=self._run, name="buffbot-coordinator", daemon=True
+        )
+        self._thread.start()
+
+    def __repr__(self):
+        return f"<CoordinatorClient (path={self.path!r})>"
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _disconnect(self):
+        if self._sock is not None:
+            self._file.close()
+            self._sock.close()
+            self._sock = self._file = None
+
+    def _request(self, **request):
+        # We connect lazily, and if we lose the connection we'll try to connect
+        # again on the next request, so a coordinator that restarts only costs
+        # us the requests that were made while it was gone.
+        if self._sock is None:
+            if not hasattr(socket, "AF_UNIX"):
+                raise OSError("Unix sockets are not supported on this platform")
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.path)
+            except OSError:
+                sock.close()
+                raise
+            self._sock, self._file = sock, sock.makefile("rwb")
+
+            # The coordinator forgets about us when we disconnect, so it needs to
+            # be told what we can cast every time we connect.
+            if self._spells is not None and request.get("op") != "register":
+                self._request(op="register", spells=self._spells)
+
+        try:
+            self._file.write(json.dumps(request).encode("utf8") + b"\n")
+            self._file.flush()
+            if not (line := self._file.readline()):
+                raise ConnectionResetError("Coordinator closed the connection")
+            return json.loads(line)
+        except (OSError, ValueError):
+            self._disconnect()
+            raise
+
+    def _run(self):
+        while (request := self._queue.get()) is not None:
+            try:
+                response = self._request(**request)
+            except (OSError, ValueError) as e:
+                error, response = e if isinstance(e, OSError) else OSError(e), None
+            else:
+                error = None
+
+            with self._lock:
+                self._error = error
+                if error is not None:
+                    self._retry_at = time.monotonic() + self.retry
+                if request["op"] == "claim":
+                    self._claiming = False
+                    if response is not None and response["target"] is not None:
+                        self._claim = (
+                            response["target"],
+                            response["spells"],
+                            datetime.fromisoformat(response["hailed"])
+                            if response.get("hailed") is not None
+                            else None,
+                        )
+
+        self._disconnect()
+
+    def _submit(self, **request):
+        # Once we've failed to reach the coordinator, we fail straight away, for
+        # the bot to fall back on itself, and only try to reconnect every so
+        # often, by registering again.
+        if (error := self._error) is not None:
+            if time.monotonic() >= self._retry_at and self._spells is not None:
+                self._retry_at = time.monotonic() + self.retry
+                self._queue.put({"op": "register", "spells": self._spells})
+            raise error
+        self._queue.put(request)
+
+    def register(self, spells: typing.Iterable[str]):
+        self._spells = list(spells)
+        with self._lock:
+            self._submit(op="register", spells=self._spells)
+
+    def hail(self, target: str, tier: int, hailed: datetime):
+        with self._lock:
+            self._submit(op="hail", target=target, tier=tier, hailed=hailed.isoformat())
+
+    def claim(
+        self,
+    ) -> typing.Optional[
+        typing.Tuple[str, typing.List[str], typing.Optional[datetime]]
+    ]:
+        # Hand over whatever we claimed since we were last asked, and ask for
+        # more if we aren't already waiting on an answer.
+        with self._lock:
+            if (claim := self._claim) is not None:
+                self._claim = None
+                return claim
+            if not self._claiming:
+                self._submit(op="claim")
+                self._claiming = True
+        return None
+
+    def done(self, target: str):
+        with self._lock:
+            self._submit(op="done", target=target)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m buffbot.core.coordinator",
+        description="Share one buff queue between several BuffBots.",
+    )
+    parser.add_argument("socket", help="the path of the unix socket to listen on")
+    parser.add_argument(
+        "--dedupe-window",
+        type=float,
+        default=30.0,
+        help="seconds to ignore hails from someone who was just buffed",
+    )
+    args = parser.parse_args(argv)
+
+    if not hasattr(socket, "AF_UNIX"):
+        parser.error("unix sockets are not supported on this platform")
+
+    with CoordinatorServer(args.socket, dedupe_window=args.dedupe_window) as server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -18,15 +18,121 @@ import typing
 
 import attr
 
+_group_re = re.compile(r"\(\?P<(?P<name>\w+)>")
+
+
+class EventDispatcher:
+    def __init__(self, event_types):
+        self.event_types = list(event_types)
+
+        # We combine every event's pattern into a single alternation, so that
+        # classifying a line is one trip into the regex engine rather than one
+        # trip per event type. Each alternative is wrapped in its own named
+        # group, and since group names have to be unique across the combined
+        # pattern, the event's own groups are prefixed with that name too.
+        #
+        # Alternatives are tried in order, so the first event type that would
+        # have matched on it's own is still the one that wins.
+        alternatives = []
+        self._dispatch = {}
+        for idx, event_type in enumerate(self.event_types):
+            key = f"_e{idx}"
+            fields = []
+
+            def _rename(m, key=key, fields=fields):
+                fields.append((f"{key}_{m.group('name')}", m.group("name")))
+                return f"(?P<{key}_{m.group('name')}>"
+
+            pattern = _group_re.sub(_rename, event_type._search_re.pattern)
+            alternatives.append(f"(?P<{key}>{pattern})")
+            self._dispatch[key] = (event_type, fields)
+
+        self._search_re = re.compile("|".join(alternatives))
+
+    def match(self, line, *, ignore=()):
+        if m := self._search_re.search(line):
+            event_type, fields = self._dispatch[m.lastgroup]
+            if event_type in ignore:
+                return None
+            return event_type, {name: m.group(group) for group, name in fields}
+
+        return None
+
+    def parse(self, date, line):
+        if (matched := self.match(line)) is not None:
+            event_type, kwargs = matched
+            return event_type(date=date, **kwargs)
+
+        return None
+
+    def literals(self, *, exclude=()):
+        # Collect the literal text that every line matching one of our events
+        # must contain. If any event can't promise that, then we return None,
+        # since there's no way to tell if a line is relevant without running
+        # it through the full pattern.
+        literals = []
+        for event_type in self.event_types:
+            if event_type in exclude:
+                continue
+            if not event_type._literals:
+                return None
+            literals.extend(event_type._literals)
+
+        return literals
+
+
+class LinePrefilter:
+    def __init__(self, literals: typing.Optional[typing.Iterable[str]]):
+        # If we weren't given any literals at all, or if one of them is empty,
+        # then every line could be relevant, and we have to let them all through.
+        if literals is not None:
+            literals = sorted(set(literals))
+            if not all(literals):
+                literals = None
+        self.literals = literals
+
+    def __repr__(self):
+        return f"<LinePrefilter (literals={self.literals!r})>"
+
+    def lines(self, text: str) -> typing.List[str]:
+        if self.literals is None:
+            return text.splitlines()
+
+        # Rather than splitting our text up into lines, and checking each line
+        # against each of our literals, we search the entire block of text for
+        # each literal, which lets the string search skip over the vast majority
+        # of lines without ever looking at them from Python. For each hit, we
+        # find the line that it belongs to, and then we return just those lines
+        # in the same order they appeared in the text.
+        starts = set()
+        for literal in self.literals:
+            idx = text.find(literal)
+            while idx != -1:
+                starts.add(text.rfind("\n", 0, idx) + 1)
+                if (end := text.find("\n", idx)) == -1:
+                    break
+                idx = text.find(literal, end)
+
+        lines = []
+        for start in sorted(starts):
+            end = text.find("\n", start)
+            lines.append(text[start:] if end == -1 else text[start:end])
+
+        return lines
+
 
 @attr.s(frozen=True, auto_attribs=True)
 class Event:
 
     date: datetime.datetime
 
-    def __init_subclass__(cls, *, search_text, **kwargs):
+    _registry: typing.ClassVar[typing.List[typing.Type[Event]]] = []
+
+    def __init_subclass__(cls, *, search_text, literals=(), **kwargs):
         super().__init_subclass__(**kwargs)
         cls._search_re = re.compile(search_text)
+        cls._literals = tuple(literals)
+        Event._registry.append(cls)
 
     @classmethod
     def search(cls, date, line):
@@ -37,7 +143,11 @@ class Event:
 
 
 @attr.s(frozen=True, auto_attribs=True)
-class Hail(Event, search_text=r"^(?P<source>\w+) says?, 'Hail, (?P<target>\w+)'$"):
+class Hail(
+    Event,
+    search_text=r"^(?P<source>\w+) says?, 'Hail, (?P<target>\w+)'$",
+    literals=["'Hail, "],
+):
 
     source: str
     target: str
@@ -45,7 +155,9 @@ class Hail(Event, search_text=r"^(?P<source>\w+) says?, 'Hail, (?P<target>\w+)'$
 
 @attr.s(frozen=True, auto_attribs=True)
 class SpellCast(
-    Event, search_text=r"^(?P<source>\w+) begins? casting (?P<spell>.+)\.$"
+    Event,
+    search_text=r"^(?P<source>\w+) begins? casting (?P<spell>.+)\.$",
+    literals=[" casting "],
 ):
 
     source: str
@@ -56,6 +168,7 @@ class SpellCast(
 class SpellBlocked(
     Event,
     search_text=r"^Your (?P<spell>.+) spell did not take hold(?: on (?P<target>\w+))?\. \(Blocked by (?P<blocked_by>.+)\.\)$",
+    literals=[" spell did not take hold"],
 ):
 
     spell: str
@@ -64,29 +177,47 @@ class SpellBlocked(
 
 
 @attr.s(frozen=True, auto_attribs=True)
-class OutOfRange(Event, search_text=r"^Your target is out of range, get closer!$"):
+class OutOfRange(
+    Event,
+    search_text=r"^Your target is out of range, get closer!$",
+    literals=["Your target is out of range, get closer!"],
+):
     pass
 
 
 @attr.s(frozen=True, auto_attribs=True)
 class SpellInterrupted(
-    Event, search_text=r"^Your (?P<spell>.+) spell is interrupted\.$"
+    Event,
+    search_text=r"^Your (?P<spell>.+) spell is interrupted\.$",
+    literals=[" spell is interrupted."],
 ):
     spell: str
 
 
 @attr.s(frozen=True, auto_attribs=True)
-class InsufficientMana(Event, search_text=r"^Insufficient Mana to cast this spell!$"):
+class InsufficientMana(
+    Event,
+    search_text=r"^Insufficient Mana to cast this spell!$",
+    literals=["Insufficient Mana to cast this spell!"],
+):
     pass
 
 
 @attr.s(frozen=True, auto_attribs=True)
-class NoTarget(Event, search_text=r"^You must first select a target for this spell!$"):
+class NoTarget(
+    Event,
+    search_text=r"^You must first select a target for this spell!$",
+    literals=["You must first select a target for this spell!"],
+):
     pass
 
 
 @attr.s(frozen=True, auto_attribs=True)
-class SpellFizzle(Event, search_text=r"^Your (?P<spell>.+) spell fizzles!$"):
+class SpellFizzle(
+    Event,
+    search_text=r"^Your (?P<spell>.+) spell fizzles!$",
+    literals=[" spell fizzles!"],
+):
 
     spell: str
 
@@ -95,12 +226,48 @@ class SpellFizzle(Event, search_text=r"^Your (?P<spell>.+) spell fizzles!$"):
 class SpellNotTakeHold(
     Event,
     search_text=r"^Your (?P<spell>.+) spell did not take hold on (?P<target>\w+)\.$",
+    literals=[" spell did not take hold on "],
 ):
     spell: str
     target: str
 
 
+@attr.s(frozen=True, auto_attribs=True)
+class GroupJoined(
+    Event,
+    search_text=r"^(?P<member>\w+) (?:has|have) joined the group\.$",
+    literals=[" joined the group."],
+):
+
+    member: str
+
+
+@attr.s(frozen=True, auto_attribs=True)
+class GroupLeft(
+    Event,
+    search_text=(
+        r"^(?P<member>\w+) (?:has|have) (?:left|been removed from) the group\.$"
+    ),
+    literals=[" left the group.", " removed from the group."],
+):
+
+    member: str
+
+
+@attr.s(frozen=True, auto_attribs=True)
+class GroupDisbanded(
+    Event,
+    search_text=r"^Your group has been disbanded\.$",
+    literals=["Your group has been disbanded."],
+):
+    pass
+
+
 @attr.s(frozen=True, auto_attribs=True)
 class Line(Event, search_text=r"^(?P<line>.+)$"):
 
     line: str
+
+
+# Built once, from every event defined above, in the order they were defined.
+dispatcher = EventDispatcher(Event._registry)
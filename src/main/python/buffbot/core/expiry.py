@@ -0,0 +1,75 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import heapq
+import typing
+
+from datetime import datetime, timedelta
+
+from .types import Spell
+
+
+class BuffExpiry:
+    def __init__(self):
+        # A mapping of (target, spell name) to when that buff will wear off,
+        # along with a heap of the same, ordered by expiry, so that we can cheaply
+        # throw away buffs that have worn off. Entries in the heap can be out of
+        # date if a buff was landed again, in which case they're just skipped.
+        self._expires: typing.Dict[typing.Tuple[str, str], datetime] = {}
+        self._heap: typing.List[typing.Tuple[datetime, typing.Tuple[str, str]]] = []
+
+    def __repr__(self):
+        return f"<BuffExpiry (active={len(self._expires)})>"
+
+    def __len__(self):
+        return len(self._expires)
+
+    @staticmethod
+    def _key(target: str, spell: Spell) -> typing.Tuple[str, str]:
+        return target.casefold(), spell.name
+
+    def landed(self, target: str, spell: Spell, date: datetime):
+        # We can only know when a buff will wear off if we know how long it
+        # lasts.
+        if spell.duration is None:
+            return
+
+        key = self._key(target, spell)
+        expires = date + spell.duration
+        self._expires[key] = expires
+        heapq.heappush(self._heap, (expires, key))
+
+    def forget(self, target: str, spell: Spell):
+        self._expires.pop(self._key(target, spell), None)
+
+    def remaining(
+        self, target: str, spell: Spell, now: datetime
+    ) -> typing.Optional[timedelta]:
+        if (expires := self._expires.get(self._key(target, spell))) is not None:
+            if expires > now:
+                return expires - now
+        return None
+
+    def active(
+        self, target: str, spell: Spell, now: datetime, *, margin: timedelta
+    ) -> bool:
+        # A buff only counts as active if it's going to last longer than our
+        # margin, otherwise it's close enough to wearing off that it's worth
+        # refreshing it while we have the person targeted anyways.
+        remaining = self.remaining(target, spell, now)
+        return remaining is not None and remaining > margin
+
+    def evict(self, now: datetime):
+        while self._heap and self._heap[0][0] <= now:
+            expires, key = heapq.heappop(self._heap)
+            if self._expires.get(key) == expires:
+                del self._expires[key]
@@ -0,0 +1,69 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import typing
+
+
+class GroupRoster:
+    def __init__(self, groups: typing.Iterable[typing.Iterable[str]] = ()):
+        # Who is grouped with who, so that we know who a single cast of a group
+        # spell will land on. Groups can be configured up front, and we also
+        # keep track of our own group from the log, since a group spell cast on
+        # anyone in our own group lands on all of us.
+        self._configured: typing.Dict[str, typing.FrozenSet[str]] = {}
+        for group in groups:
+            members = frozenset(name.casefold() for name in group)
+            for member in members:
+                self._configured[member] = members
+
+        self._own: typing.Set[str] = set()
+
+    def __repr__(self):
+        return (
+            f"<GroupRoster (configured={len(self._configured)!r}, "
+            f"own={sorted(self._own)!r})>"
+        )
+
+    def joined(self, member: str):
+        # When we're the ones who joined, it's a whole new group, and we'll hear
+        # about everyone else in it as they join.
+        if member.lower() == "you":
+            self._own.clear()
+        else:
+            self._own.add(member.casefold())
+
+    def left(self, member: str):
+        if member.lower() == "you":
+            self._own.clear()
+        else:
+            self._own.discard(member.casefold())
+
+    def disbanded(self):
+        self._own.clear()
+
+    def members(self, target: str) -> typing.FrozenSet[str]:
+        # Everyone who would get a group spell cast on target, as case folded
+        # names, which is always at least the target themselves.
+        key = target.casefold()
+        if key in self._own:
+            return frozenset(self._own)
+        return self._configured.get(key, frozenset([key]))
+
+    def covered(self, target: str, others: typing.Iterable[str]) -> typing.List[str]:
+        # Which of others would also get a group spell cast on target.
+        members = self.members(target)
+        key = target.casefold()
+        return [
+            name
+            for name in others
+            if (other := name.casefold()) != key and other in members
+        ]
@@ -0,0 +1,199 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import typing
+
+from datetime import datetime, timedelta
+
+import attr
+
+from .actions import Action, CastSpell, Target
+
+
+class LatencyHistogram:
+    def __init__(self, *, precision_bits: int = 7):
+        # Like an HDR histogram, values are bucketed by their magnitude, and
+        # then linearly within each magnitude, so that every recorded value is
+        # kept to within 1 / 2 ** (precision_bits - 1) of what it really was,
+        # no matter how large it is, in a (sparse) fixed amount of memory.
+        self.precision_bits = precision_bits
+
+        self._counts: typing.Dict[typing.Tuple[int, int], int] = {}
+        self.count = 0
+        self.total = 0
+        self.min: typing.Optional[int] = None
+        self.max: typing.Optional[int] = None
+
+    def __repr__(self):
+        return f"<LatencyHistogram (count={self.count!r})>"
+
+    def record(self, value: timedelta):
+        # We record in whole milliseconds.
+        value = max(0, int(value.total_seconds() * 1000))
+        shift = max(value.bit_length() - self.precision_bits, 0)
+        key = (shift, value >> shift)
+        self._counts[key] = self._counts.get(key, 0) + 1
+
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, percentile: float) -> typing.Optional[timedelta]:
+        if not self.count:
+            return None
+
+        # Walk the buckets from smallest to largest until we've seen enough
+        # values, and report the highest value that bucket could hold.
+        wanted = max(1, round(self.count * percentile / 100))
+        seen = 0
+        for shift, bucket in sorted(self._counts, key=lambda k: k[1] << k[0]):
+            seen += self._counts[(shift, bucket)]
+            if seen >= wanted:
+                value = min(((bucket + 1) << shift) - 1, self.max)
+                return timedelta(milliseconds=value)
+
+        return timedelta(milliseconds=self.max)
+
+    def summary(self) -> typing.Dict[str, typing.Optional[float]]:
+        def seconds(value):
+            return value.total_seconds() if value is not None else None
+
+        return {
+            "count": self.count,
+            "mean": self.total / self.count / 1000 if self.count else None,
+            "p50": seconds(self.percentile(50)),
+            "p95": seconds(self.percentile(95)),
+            "p99": seconds(self.percentile(99)),
+            "max": self.max / 1000 if self.max is not None else None,
+        }
+
+
+@attr.s(slots=True, auto_attribs=True)
+class BuffRequest:
+
+    target: str
+    hailed: datetime
+    targeted: typing.Optional[datetime] = None
+    finished: typing.Optional[datetime] = None
+    queue_wait: timedelta = timedelta(0)
+    targeting: timedelta = timedelta(0)
+    casting: timedelta = timedelta(0)
+    casts: int = 0
+    landed: int = 0
+
+    @property
+    def total(self) -> timedelta:
+        return self.finished - self.hailed
+
+    @property
+    def pauses(self) -> timedelta:
+        # Whatever time wasn't spent waiting in the queue, targeting, or casting
+        # was spent between actions, waiting out pauses or for the window.
+        return max(
+            timedelta(0), self.total - self.queue_wait - self.targeting - self.casting
+        )
+
+
+class LatencyTracker:
+
+    STAGES = ["total", "queue_wait", "targeting", "casting", "pauses"]
+
+    def __init__(self, *, recent: int = 100):
+        # Each person who hails us is tracked from their hail, through being
+        # targeted and every spell we cast on them, until we're done with them,
+        # and what they waited for in each of those stages is aggregated once
+        # we're done with them.
+        self.histograms = {stage: LatencyHistogram() for stage in self.STAGES}
+        self.recent: typing.Deque[BuffRequest] = collections.deque(maxlen=recent)
+
+        # When we're planning across more than one person at a time, we can be
+        # in the middle of buffing several people at once, in which case time
+        # spent on everyone else counts as a pause for each of them.
+        self._requests: typing.Dict[str, BuffRequest] = {}
+        self._active: typing.Dict[str, BuffRequest] = {}
+        self._current: typing.Optional[BuffRequest] = None
+        self._action_started: typing.Optional[datetime] = None
+
+    def __repr__(self):
+        return f"<LatencyTracker (count={self.count!r})>"
+
+    @property
+    def count(self) -> int:
+        return self.histograms["total"].count
+
+    def hailed(self, target: str, date: datetime):
+        # Only the first hail counts, hailing us again doesn't get anyone to the
+        # front of the line.
+        key = target.casefold()
+        if key not in self._requests:
+            self._requests[key] = BuffRequest(target=target, hailed=date)
+
+    def forget(self, target: str):
+        self._requests.pop(target.casefold(), None)
+
+    def clear(self):
+        # Forget everyone who is still waiting, without counting them.
+        self._requests.clear()
+
+    def started(self, action: Action, date: datetime):
+        self._action_started = date
+
+        if isinstance(action, Target):
+            key = action.target.casefold()
+            if (request := self._active.get(key)) is None:
+                if (request := self._requests.pop(key, None)) is not None:
+                    request.targeted = date
+                    request.queue_wait = max(timedelta(0), date - request.hailed)
+                    self._active[key] = request
+            self._current = request
+        elif isinstance(action, CastSpell) and self._current is not None:
+            self._current.casts += 1
+
+    def completed(self, action: Action, date: datetime, ok: bool):
+        if (request := self._current) is None or self._action_started is None:
+            return
+
+        elapsed = max(timedelta(0), date - self._action_started)
+        if isinstance(action, Target):
+            request.targeting += elapsed
+        elif isinstance(action, CastSpell):
+            request.casting += elapsed
+            request.landed += ok
+        request.finished = date
+
+    def finish(self):
+        # We're done with whoever we were buffing, so for everyone we managed to
+        # land anything on, we'll add how long they waited to our totals.
+        active, self._active, self._current = self._active, {}, None
+        for request in active.values():
+            if request.landed:
+                for stage, histogram in self.histograms.items():
+                    histogram.record(getattr(request, stage))
+                self.recent.append(request)
+
+    def summary(self) -> typing.Dict[str, typing.Dict[str, typing.Optional[float]]]:
+        return {stage: h.summary() for stage, h in self.histograms.items()}
+
+
+def format_summary(summary) -> typing.List[str]:
+    def fmt(value):
+        return f"{value:.1f}s" if value is not None else "-"
+
+    lines = [f"{'':<12}{'count':>7}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}"]
+    for stage, stats in summary.items():
+        lines.append(
+            f"{stage:<12}{stats['count']:>7}{fmt(stats['p50']):>9}"
+            f"{fmt(stats['p95']):>9}{fmt(stats['p99']):>9}{fmt(stats['max']):>9}"
+        )
+    return lines
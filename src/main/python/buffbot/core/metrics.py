@@ -0,0 +1,208 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import bisect
+import http.server
+import threading
+import typing
+
+
+class Histogram:
+    def __init__(self, buckets: typing.Iterable[float]):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def __repr__(self):
+        return f"<Histogram (count={self.count!r}, sum={self.sum!r})>"
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+
+    # In seconds, from someone hailing us to us starting to cast our first spell
+    # on them, which includes however long they waited in the queue.
+    LATENCY_BUCKETS = (0.5, 1, 2.5, 5, 10, 15, 30, 60, 120, 300)
+
+    def __init__(self, **labels: str):
+        self.labels = labels
+
+        # These are only ever updated by the thread running the bot, and are
+        # plain counters so that keeping them up to date is only ever a few
+        # increments, while whoever is exporting them takes a copy to read.
+        self.lines = 0
+        self.events: typing.Dict[str, int] = {}
+        self.casts_attempted: typing.Dict[str, int] = {}
+        self.casts_succeeded: typing.Dict[str, int] = {}
+        self.failures: typing.Dict[str, int] = {}
+        self.queue_depth = 0
+        self.hail_to_cast = Histogram(self.LATENCY_BUCKETS)
+
+    def __repr__(self):
+        return f"<Metrics (labels={self.labels!r})>"
+
+    @staticmethod
+    def increment(counter: typing.Dict[str, int], key: str):
+        counter[key] = counter.get(key, 0) + 1
+
+
+# Each family of metrics that we export, as its name, type, and help text, along
+# with how to get its samples, as (suffix, labels, value), from a Metrics.
+_FAMILIES = [
+    (
+        "buffbot_lines_total",
+        "counter",
+        "Relevant log lines processed.",
+        lambda m: [("", {}, m.lines)],
+    ),
+    (
+        "buffbot_events_total",
+        "counter",
+        "Events seen, by type.",
+        lambda m: [("", {"event": k}, v) for k, v in dict(m.events).items()],
+    ),
+    (
+        "buffbot_casts_attempted_total",
+        "counter",
+        "Spells we've started casting, by spell.",
+        lambda m: [("", {"spell": k}, v) for k, v in dict(m.casts_attempted).items()],
+    ),
+    (
+        "buffbot_casts_succeeded_total",
+        "counter",
+        "Spells that have landed, by spell.",
+        lambda m: [("", {"spell": k}, v) for k, v in dict(m.casts_succeeded).items()],
+    ),
+    (
+        "buffbot_failures_total",
+        "counter",
+        "Failed actions, by the event that failed them.",
+        lambda m: [("", {"kind": k}, v) for k, v in dict(m.failures).items()],
+    ),
+    (
+        "buffbot_queue_depth",
+        "gauge",
+        "People waiting in the buff queue.",
+        lambda m: [("", {}, m.queue_depth)],
+    ),
+    (
+        "buffbot_hail_to_cast_seconds",
+        "histogram",
+        "Time from being hailed to starting the first cast.",
+        lambda m: _histogram(m.hail_to_cast),
+    ),
+]
+
+
+def _histogram(histogram):
+    counts = list(histogram.counts)
+    samples, total = [], 0
+    for bound, count in zip(histogram.buckets + (float("inf"),), counts):
+        total += count
+        le = "+Inf" if bound == float("inf") else repr(float(bound))
+        samples.append(("_bucket", {"le": le}, total))
+    samples.append(("_sum", {}, histogram.sum))
+    samples.append(("_count", {}, total))
+
+    return samples
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: typing.List[Metrics] = []
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"<MetricsRegistry (metrics={self._metrics!r})>"
+
+    def create(self, **labels: str) -> Metrics:
+        metrics = Metrics(**labels)
+        with self._lock:
+            self._metrics.append(metrics)
+        return metrics
+
+    def remove(self, metrics: Metrics):
+        with self._lock:
+            self._metrics.remove(metrics)
+
+    def render(self) -> str:
+        # Render everything in the Prometheus text exposition format.
+        with self._lock:
+            all_metrics = list(self._metrics)
+
+        lines = []
+        for name, kind, help_text, samples in _FAMILIES:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for metrics in all_metrics:
+                for suffix, labels, value in samples(metrics):
+                    labels = {**metrics.labels, **labels}
+                    rendered = ",".join(
+                        f'{k}="{_escape(str(v))}"' for k, v in labels.items()
+                    )
+                    rendered = f"{{{rendered}}}" if rendered else ""
+                    lines.append(f"{name}{suffix}{rendered} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+
+        body = self.server.registry.render().encode("utf8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MetricsServer(http.server.ThreadingHTTPServer):
+
+    daemon_threads = True
+
+    def __init__(self, registry: MetricsRegistry, host: str = "127.0.0.1", port=9464):
+        super().__init__((host, port), _Handler)
+        self.registry = registry
+
+        # Scrapes are served from threads of their own, so exporting never
+        # blocks whoever is running the bots.
+        self._thread = threading.Thread(
+            target=self.serve_forever, name="buffbot-metrics", daemon=True
+        )
+
+    def __repr__(self):
+        return f"<MetricsServer (address={self.server_address!r})>"
+
+    def start(self):
+        self._thread.start()
+
+    def close(self):
+        if self._thread.is_alive():
+            self.shutdown()
+            self._thread.join()
+        self.server_close()
@@ -0,0 +1,138 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import queue
+import sys
+import threading
+import traceback
+import typing
+
+from datetime import datetime
+
+from .trace import Tracer
+from .utils import type_command, write_command
+
+
+class OutputBackend:
+    def send(self, commands: typing.Sequence[str]):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class PasteBackend(OutputBackend):
+    def send(self, commands: typing.Sequence[str]):
+        # Pasting is much faster than typing, but if we can't get at the
+        # clipboard for some reason, then we'll fall back to typing.
+        for command in commands:
+            write_command(command)
+
+
+class TypedBackend(OutputBackend):
+    def send(self, commands: typing.Sequence[str]):
+        for command in commands:
+            type_command(command)
+
+
+class RecordingBackend(OutputBackend):
+    def __init__(self, *, clock: typing.Callable[[], datetime] = datetime.now):
+        self.clock = clock
+        self.commands: typing.List[typing.Tuple[datetime, str]] = []
+
+    def send(self, commands: typing.Sequence[str]):
+        now = self.clock()
+        self.commands.extend((now, command) for command in commands)
+
+
+class LoggingBackend(OutputBackend):
+    def __init__(self, logger: typing.Callable[[str], None]):
+        self.logger = logger
+
+    def send(self, commands: typing.Sequence[str]):
+        for command in commands:
+            self.logger(f"Command: {command}")
+
+
+class OutputThread(OutputBackend):
+    def __init__(
+        self,
+        backend: OutputBackend,
+        *,
+        maxsize: int = 64,
+        logger: typing.Optional[typing.Callable[[str], None]] = None,
+        tracer: typing.Optional[Tracer] = None,
+    ):
+        self.backend = backend
+        self.logger = logger
+        self.tracer = tracer
+
+        # Sending keystrokes is slow, so we do it from a thread of it's own so
+        # that whoever is asking us to send them can go back to reading the log.
+        # The queue is bounded, so if the game stops accepting input for some
+        # reason, we'll eventually push back rather than queueing up forever.
+        self._queue: queue.Queue = queue.Queue(maxsize)
+        self._thread = threading.Thread(
+            target=self._run, name="buffbot-output", daemon=True
+        )
+        self._thread.start()
+
+    def __repr__(self):
+        return f"<OutputThread (backend={self.backend!r})>"
+
+    def send(self, commands: typing.Sequence[str]):
+        self._queue.put(list(commands))
+
+    def flush(self):
+        self._queue.join()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        self.backend.close()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            if (commands := self._queue.get()) is None:
+                self._queue.task_done()
+                break
+
+            # Anything else that has been queued up while we were waiting gets
+            # sent along with these commands, as a single burst.
+            count = 1
+            while True:
+                try:
+                    more = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                count += 1
+                if more is None:
+                    stopping = True
+                    break
+                commands.extend(more)
+
+            try:
+                if (tracer := self.tracer) is not None:
+                    start = tracer.now()
+                    self.backend.send(commands)
+                    tracer.record("output.send", start)
+                    tracer.count("output.commands", len(commands))
+                else:
+                    self.backend.send(commands)
+            except Exception:
+                if self.logger is not None:
+                    self.logger(f"Could not send commands: {commands!r}")
+                traceback.print_exc(file=sys.stderr)
+            finally:
+                for _ in range(count):
+                    self._queue.task_done()
@@ -0,0 +1,104 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import typing
+
+from datetime import datetime, timedelta
+
+from .actions import Action, CastSpell, Target
+from .types import Spell
+
+
+class CastPlanner:
+    def __init__(
+        self,
+        *,
+        horizon: int = 4,
+        retarget: timedelta = timedelta(seconds=1),
+        recovery: timedelta = timedelta(seconds=2),
+        cast_time: timedelta = timedelta(seconds=3),
+    ):
+        # How many people from the front of the queue we'll plan for at once,
+        # along with how long we expect targeting someone, recovering after a
+        # cast, and casting a spell that doesn't tell us how long it takes, to
+        # take.
+        self.horizon = horizon
+        self.retarget = retarget
+        self.recovery = recovery
+        self.cast_time = cast_time
+
+    def __repr__(self):
+        return f"<CastPlanner (horizon={self.horizon!r})>"
+
+    def plan(
+        self,
+        requests: typing.List[typing.Tuple[str, typing.List[Spell]]],
+        *,
+        now: datetime,
+        ready: typing.Dict[int, datetime],
+        current: typing.Optional[str] = None,
+        cast_time: typing.Optional[typing.Callable[[Spell], timedelta]] = None,
+    ) -> typing.List[Action]:
+        # Given the people we're about to buff, in the order they're queued,
+        # and the spells each of them needs, we simulate casting them one at a
+        # time, each time picking whichever cast could start soonest. That
+        # keeps us on the same target for as long as there is something ready
+        # to cast on them, but rather than sitting around waiting for a gem to
+        # come off of its recast timer, we'll move on to someone who needs a
+        # spell that is ready. Ties go to whoever is earlier in the queue, and
+        # then to the order the spells are configured in.
+        #
+        # Everyone still gets exactly the spells that they asked for, and every
+        # cast is still preceded by targeting the person it's for.
+        remaining = [(target, list(spells)) for target, spells in requests if spells]
+        ready = dict(ready)
+        clock = now
+        actions: typing.List[Action] = []
+
+        while remaining:
+            best = None
+            for position, (target, spells) in enumerate(remaining):
+                switch = (
+                    self.retarget
+                    if current is None or target.lower() != current.lower()
+                    else timedelta(0)
+                )
+                for order, spell in enumerate(spells):
+                    start = max(clock + switch, ready.get(spell.gem, clock))
+                    finish = start + self._cast_time(spell, cast_time)
+                    if best is None or (start, position, order) < best[0]:
+                        best = (start, position, order), finish, target, spell
+
+            (_, position, order), finish, target, spell = best
+
+            if current is None or target.lower() != current.lower():
+                actions.append(Target(target=target))
+                current = target
+            actions.append(CastSpell(target=target, spell=spell))
+
+            # A gem's recast timer starts once the spell has finished casting.
+            if spell.recast is not None:
+                ready[spell.gem] = finish + spell.recast
+            clock = finish + self.recovery
+
+            del remaining[position][1][order]
+            if not remaining[position][1]:
+                del remaining[position]
+
+        return actions
+
+    def _cast_time(self, spell: Spell, cast_time) -> timedelta:
+        if spell.cast_time is not None:
+            return spell.cast_time
+        if cast_time is not None:
+            return cast_time(spell)
+        return self.cast_time
@@ -0,0 +1,243 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+import typing
+
+from datetime import datetime
+
+import attr
+
+from . import BuffBot
+from .latency import format_summary
+from .output import RecordingBackend
+from .tailer import LogTailer
+from .timestamps import TimestampParser
+from .timings import SpellTimings
+from .trace import Tracer
+from .types import Spell
+from .utils import FakeFocus
+
+
+class VirtualClock:
+    def __init__(self, now: typing.Optional[datetime] = None):
+        self.now = now
+
+    def __repr__(self):
+        return f"<VirtualClock (now={self.now!r})>"
+
+    def __call__(self) -> datetime:
+        return self.now
+
+
+@attr.s(slots=True, auto_attribs=True, frozen=True)
+class ReplayResult:
+
+    size: int
+    lines: int
+    events: int
+    commands: typing.List[typing.Tuple[datetime, str]]
+    messages: typing.List[typing.Tuple[datetime, str]]
+    started: typing.Optional[datetime]
+    finished: typing.Optional[datetime]
+    elapsed: float
+    latency: typing.Dict[str, typing.Dict[str, typing.Optional[float]]]
+
+
+class Replay:
+    def __init__(
+        self,
+        filename: os.PathLike,
+        *,
+        spells: typing.List[Spell],
+        acls: typing.List[str],
+        tracer: typing.Optional[Tracer] = None,
+        timings: typing.Optional[SpellTimings] = None,
+    ):
+        self.filename = filename
+        self.spells = spells
+        self.acls = acls
+        self.tracer = tracer
+        self.timings = timings
+
+    def __repr__(self):
+        return f"<Replay (filename={self.filename!r})>"
+
+    def run(self) -> ReplayResult:
+        clock = VirtualClock()
+        output = RecordingBackend(clock=clock)
+        messages = []
+
+        bot = BuffBot(
+            filename=self.filename,
+            spells=self.spells,
+            acls=self.acls,
+            logger=lambda line: messages.append((clock(), line)),
+            clock=clock,
+            output=output,
+            focus=FakeFocus(True),
+            tracer=self.tracer,
+            timings=self.timings,
+        )
+        parse_timestamp = TimestampParser()
+
+        lines = events = 0
+        first = None
+        started = time.perf_counter()
+
+        tailer = LogTailer(self.filename)
+        tailer.open()
+        try:
+            for text in tailer.read_text():
+                for line in bot.relevant_lines(text):
+                    lines += 1
+
+                    # Before we hand the line to the bot, we move our clock
+                    # forward to when it was written, stopping at each of the
+                    # bot's deadlines along the way to call process(), just
+                    # like the worker would have, so that pauses and timeouts
+                    # expire when they should have.
+                    if m := BuffBot._line_re.search(line):
+                        date = parse_timestamp(m.group("date"))
+                        if clock.now is None:
+                            first = clock.now = date
+                        while (
+                            deadline := bot.next_deadline()
+                        ) is not None and deadline <= date:
+                            clock.now = max(clock.now, deadline)
+                            bot.process()
+                        clock.now = max(clock.now, date)
+
+                    if bot.feed(line) is not None:
+                        events += 1
+                    bot.process()
+            size = tailer.offset
+        finally:
+            tailer.close()
+
+        # Replaying old logs is a good way to learn how long our spells take.
+        bot.timings.save()
+
+        return ReplayResult(
+            size=size,
+            lines=lines,
+            events=events,
+            commands=output.commands,
+            messages=messages,
+            started=first,
+            finished=clock.now,
+            elapsed=time.perf_counter() - started,
+            latency=bot.latency.summary(),
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m buffbot.core.replay",
+        description="Replay a recorded EverQuest log through BuffBot.",
+    )
+    parser.add_argument("filename", help="the eqlog file to replay")
+    parser.add_argument(
+        "--spell",
+        nargs=3,
+        action="append",
+        default=[],
+        metavar=("NAME", "GEM", "SUCCESS_MESSAGE"),
+        help="a spell to buff with, may be given multiple times",
+    )
+    parser.add_argument(
+        "--acl",
+        action="append",
+        default=[],
+        help="an ACL entry, may be given multiple times",
+    )
+    parser.add_argument(
+        "--json", action="store_true", help="output the results as JSON"
+    )
+    parser.add_argument(
+        "--trace", metavar="FILE", help="write timings for each stage to FILE"
+    )
+    parser.add_argument(
+        "--trace-sample",
+        type=float,
+        default=0.0,
+        metavar="RATE",
+        help="the fraction of timings to also keep as individual spans",
+    )
+    parser.add_argument(
+        "--timings",
+        metavar="FILE",
+        help="start from the spell timings in FILE, and save what was learned to it",
+    )
+    args = parser.parse_args(argv)
+
+    tracer = Tracer(sample_rate=args.trace_sample) if args.trace else None
+
+    replay = Replay(
+        args.filename,
+        spells=[
+            Spell(name=name, gem=int(gem), success_message=success_message)
+            for name, gem, success_message in args.spell
+        ],
+        acls=args.acl,
+        tracer=tracer,
+        timings=SpellTimings(args.timings) if args.timings else None,
+    )
+    result = replay.run()
+
+    if tracer is not None:
+        tracer.dump(args.trace)
+
+    if args.json:
+        json.dump(
+            {
+                "size": result.size,
+                "lines": result.lines,
+                "events": result.events,
+                "commands": [[d.isoformat(), c] for d, c in result.commands],
+                "messages": [[d.isoformat(), m] for d, m in result.messages],
+                "started": result.started and result.started.isoformat(),
+                "finished": result.finished and result.finished.isoformat(),
+                "elapsed": result.elapsed,
+                "latency": result.latency,
+            },
+            sys.stdout,
+            indent=2,
+        )
+        print()
+    else:
+        for date, command in result.commands:
+            print(f"[{date:%Y-%m-%d %H:%M:%S}] {command}")
+
+        duration = (
+            (result.finished - result.started).total_seconds()
+            if result.started is not None
+            else 0
+        )
+        print(
+            f"Replayed {duration:,.0f}s of log ({result.size:,} bytes, "
+            f"{result.events:,} events) in {result.elapsed:.2f}s, "
+            f"sending {len(result.commands):,} commands.",
+            file=sys.stderr,
+        )
+        for line in format_summary(result.latency):
+            print(line, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import heapq
+import itertools
+import typing
+
+from datetime import datetime
+
+
+class Deadlines:
+    def __init__(self):
+        # A heap of [when, sequence, key] entries, along with a mapping of key
+        # to the entry for that key, so that replacing or cancelling a deadline
+        # doesn't require searching the heap. Instead, replaced entries have
+        # their key cleared, and are thrown away when they reach the top.
+        self._heap = []
+        self._entries = {}
+        self._counter = itertools.count()
+
+    def __repr__(self):
+        return f"<Deadlines (next={self.next()!r})>"
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def set(self, key: typing.Hashable, when: typing.Optional[datetime]):
+        self.cancel(key)
+        if when is not None:
+            entry = [when, next(self._counter), key]
+            self._entries[key] = entry
+            heapq.heappush(self._heap, entry)
+
+    def cancel(self, key: typing.Hashable):
+        if (entry := self._entries.pop(key, None)) is not None:
+            entry[-1] = None
+
+    def next(self) -> typing.Optional[datetime]:
+        self._discard_cancelled()
+        return self._heap[0][0] if self._heap else None
+
+    def expire(self, now: datetime) -> typing.List[typing.Hashable]:
+        # Remove, and return the keys of, every deadline that is at or before
+        # the given time.
+        expired = []
+        while self._heap and self._discard_cancelled() and self._heap[0][0] <= now:
+            _, _, key = heapq.heappop(self._heap)
+            del self._entries[key]
+            expired.append(key)
+
+        return expired
+
+    def _discard_cancelled(self):
+        while self._heap and self._heap[0][-1] is None:
+            heapq.heappop(self._heap)
+        return bool(self._heap)
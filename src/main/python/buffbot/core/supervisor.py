@@ -0,0 +1,200 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import os
+import typing
+
+from datetime import datetime
+
+from . import BuffBot
+from .metrics import MetricsRegistry
+from .output import OutputBackend, OutputThread, PasteBackend
+from .scheduler import Deadlines
+from .trace import Tracer
+from .types import Character
+from .utils import WindowFocus
+from .watch import Change, watcher_for
+
+
+class Supervisor:
+    def __init__(
+        self,
+        *,
+        logger: typing.Optional[typing.Callable[[str], None]] = None,
+        clock: typing.Callable[[], datetime] = datetime.now,
+        backend: typing.Callable[[], OutputBackend] = PasteBackend,
+        tracer: typing.Optional[Tracer] = None,
+        metrics: typing.Optional[MetricsRegistry] = None,
+    ):
+        self.logger = logger
+        self.clock = clock
+        self.backend = backend
+        self.tracer = tracer
+        self.metrics = metrics
+
+        self.bots: typing.Dict[Character, BuffBot] = {}
+        self._files: typing.Dict[str, Character] = {}
+
+        # Every bot gets it's own deadlines, but rather than having a timer for
+        # each of them, we only track the earliest deadline of each bot, so we
+        # only ever wake up for the bots that actually have something to do.
+        self._deadlines = Deadlines()
+
+        # Each character sends its commands to its own game window, through its
+        # own output thread. Two characters can't share a window, since we'd
+        # have no way to know which of them is logged in to it.
+        self._outputs: typing.Dict[Character, OutputThread] = {}
+        self._windows: typing.Dict[Character, str] = {}
+
+        self._watcher = None
+
+    def __repr__(self):
+        return f"<Supervisor (characters={list(self.bots)!r})>"
+
+    def add(self, filename: str, *, window: str = "EverQuest", **kwargs) -> BuffBot:
+        char = Character.from_filename(filename)
+        if char in self.bots:
+            raise ValueError(f"Already running {char.name} ({char.server_display})")
+        for other, used in self._windows.items():
+            if used == window:
+                raise ValueError(
+                    f"{other.name} ({other.server_display}) is already using the "
+                    f"{window!r} window, each character needs a window of its own"
+                )
+
+        output = OutputThread(self.backend(), logger=self.logger, tracer=self.tracer)
+
+        bot = BuffBot(
+            filename=filename,
+            logger=self._logger_for(char),
+            clock=self.clock,
+            output=output,
+            focus=WindowFocus(window),
+            tracer=self.tracer,
+            metrics=(
+                self.metrics.create(character=char.name, server=char.server.value)
+                if self.metrics is not None
+                else None
+            ),
+            **kwargs,
+        )
+        self.bots[char] = bot
+        self._files[os.path.abspath(filename)] = char
+        self._outputs[char] = output
+        self._windows[char] = window
+
+        # If we're already running, then the new bot needs to start up now,
+        # otherwise it'll get started along with everyone else.
+        if self._watcher is not None:
+            self._start(char)
+
+        return bot
+
+    def remove(self, char: Character):
+        bot = self.bots.pop(char)
+        del self._files[os.path.abspath(bot.filename)]
+        self._deadlines.cancel(char)
+        self._outputs.pop(char).close()
+        del self._windows[char]
+
+        if self._watcher is not None:
+            self._watcher.remove(bot.filename)
+        if bot.metrics is not None:
+            self.metrics.remove(bot.metrics)
+        bot.close()
+
+    def close(self):
+        # One bot failing to close shouldn't stop us from closing the rest, we
+        # just log it and carry on.
+        for char in list(self.bots):
+            try:
+                self.remove(char)
+            except Exception as exc:
+                if self.logger is not None:
+                    self.logger(f"Could not close {char.name}: {exc!r}")
+
+        if self._watcher is not None:
+            self._watcher.close()
+            self._watcher = None
+
+    def _logger_for(self, char):
+        if (logger := self.logger) is None:
+            return None
+
+        # With more than one character running, our log messages need to say
+        # which one of them they're about.
+        def log(message):
+            logger(f"[{char.name}] {message}")
+
+        return log
+
+    def _start(self, char):
+        bot = self.bots[char]
+        self._watcher.add(bot.filename)
+        bot.load()
+
+        # Read anything that we're catching up on, before we start waiting.
+        bot.read()
+        bot.process()
+        self._schedule(char)
+
+    def _schedule(self, char):
+        self._deadlines.set(char, self.bots[char].next_deadline())
+
+    def next_deadline(self) -> typing.Optional[datetime]:
+        return self._deadlines.next()
+
+    def changed(self, filename: str, changes: Change):
+        if (char := self._files.get(os.path.abspath(filename))) is None:
+            return
+
+        bot = self.bots[char]
+        if changes & Change.REPLACED:
+            bot.reload()
+        if changes:
+            bot.read()
+        bot.process()
+        self._schedule(char)
+
+    def process(self):
+        # Only the bots whose deadlines have come up have anything to do.
+        for char in self._deadlines.expire(self.clock()):
+            self.bots[char].process()
+            self._schedule(char)
+
+    def _timeout(self) -> typing.Optional[float]:
+        if (deadline := self.next_deadline()) is None:
+            return None
+        return max(0.0, (deadline - self.clock()).total_seconds())
+
+    async def run(self):
+        self._watcher = watcher_for()
+        try:
+            for char in list(self.bots):
+                self._start(char)
+
+            # Sleep until either one of the log files change, or the earliest
+            # deadline of any of our bots comes up, whichever happens first.
+            while True:
+                try:
+                    changes = await asyncio.wait_for(
+                        self._watcher.wait_many(), self._timeout()
+                    )
+                except asyncio.TimeoutError:
+                    changes = {}
+
+                for filename, change in changes.items():
+                    self.changed(filename, change)
+                self.process()
+        finally:
+            self.close()
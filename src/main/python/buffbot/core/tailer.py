@@ -0,0 +1,160 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import mmap
+import os
+import typing
+
+from datetime import datetime
+
+from .timestamps import TimestampParser
+from .utils import shared_open
+
+
+class LogTailer:
+    def __init__(
+        self,
+        filename: os.PathLike,
+        *,
+        chunk_size: int = 64 * 1024,
+        encoding: str = "utf8",
+        errors: str = "replace",
+    ):
+        self.filename = filename
+        self.chunk_size = chunk_size
+        self.encoding = encoding
+        self.errors = errors
+
+        self._fp = None
+        self._buffer = bytearray()
+        self._offset = 0
+
+    def __repr__(self):
+        return f"<LogTailer (filename={self.filename!r})>"
+
+    @property
+    def offset(self) -> int:
+        # The offset of the first byte that we have not yet handed out as part
+        # of a complete line, which is where reading should resume from.
+        return self._offset
+
+    def open(self, *, at_end: bool = False):
+        self._fp = shared_open(self.filename)
+        self._buffer.clear()
+        self._offset = self._fp.seek(0, os.SEEK_END if at_end else os.SEEK_SET)
+
+    def seek(self, offset: int):
+        self._buffer.clear()
+        self._offset = self._fp.seek(offset)
+
+    def size(self) -> int:
+        return os.fstat(self._fp.fileno()).st_size
+
+    def find_offset(self, since: datetime) -> int:
+        # Find the offset of the first line in the file that was written at, or
+        # after, the given date. Log files can be gigabytes in size, so instead
+        # of reading through them, we memory map the file and do a binary search
+        # over the timestamps at the start of each line.
+        if (size := self.size()) == 0:
+            return 0
+
+        parse = TimestampParser()
+        with mmap.mmap(self._fp.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            lo, hi = 0, size
+            while lo < hi:
+                mid = (lo + hi) // 2
+                date = _line_date(mm, _line_start(mm, mid), parse)
+                if date is None or date >= since:
+                    hi = mid
+                else:
+                    lo = mid + 1
+
+            return _line_start(mm, lo)
+
+    def date_before(self, offset: int) -> typing.Optional[datetime]:
+        # The date of the line that ends just before the given offset, which is
+        # the last line we read when the offset is where we're up to, or None if
+        # there is no such line or it doesn't have a timestamp.
+        if offset <= 0 or offset > self.size():
+            return None
+
+        with mmap.mmap(self._fp.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            start = mm.rfind(b"\n", 0, offset - 1) + 1
+            return _timestamp(mm, start, offset, TimestampParser())
+
+    def reopen(self):
+        self.close()
+        self.open()
+
+    def close(self):
+        if self._fp is not None:
+            self._fp.close()
+            self._fp = None
+        self._buffer.clear()
+
+    def read_lines(self) -> typing.Iterator[str]:
+        for text in self.read_text():
+            yield from text.splitlines()
+
+    def read_text(self) -> typing.Iterator[str]:
+        # We read the file in large binary chunks, and only ever decode the
+        # portion of our buffer that ends with a newline. Anything after the
+        # last newline is a line that the game is still in the middle of writing,
+        # so we hold onto it and finish it off on a later read, rather than
+        # parsing half of a line.
+        #
+        # The log is *supposed* to be UTF-8, but a single bad byte shouldn't be
+        # able to take down the whole bot, so we decode tolerantly.
+        while chunk := self._fp.read(self.chunk_size):
+            self._buffer += chunk
+
+            if (end := self._buffer.rfind(b"\n")) == -1:
+                continue
+
+            with memoryview(self._buffer) as view:
+                text = str(view[:end], self.encoding, self.errors)
+            del self._buffer[: end + 1]
+            self._offset += end + 1
+
+            yield text
+
+
+def _line_start(mm, pos):
+    # The start of the first line that begins at, or after, pos.
+    if pos == 0:
+        return 0
+    if (idx := mm.find(b"\n", pos - 1)) == -1:
+        return len(mm)
+    return idx + 1
+
+
+def _line_date(mm, start, parse):
+    # The date of the first line at, or after, start that has a timestamp we
+    # can parse, or None if we've hit the end of the file without finding one.
+    while start < len(mm):
+        if (date := _timestamp(mm, start, start + 64, parse)) is not None:
+            return date
+        start = _line_start(mm, start + 1)
+
+    return None
+
+
+def _timestamp(mm, start, limit, parse):
+    # The timestamp at the start of the line beginning at start, if there is one
+    # that closes before limit.
+    if mm[start : start + 1] == b"[":
+        if (end := mm.find(b"]", start, limit)) != -1:
+            try:
+                return parse(mm[start + 1 : end].decode("ascii"))
+            except ValueError:
+                pass
+    return None
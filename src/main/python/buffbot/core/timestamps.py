@@ -0,0 +1,75 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from datetime import datetime
+
+TIMESTAMP_FORMAT = "%a %b %d %H:%M:%S %Y"
+
+_MONTHS = {
+    "Jan": 1,
+    "Feb": 2,
+    "Mar": 3,
+    "Apr": 4,
+    "May": 5,
+    "Jun": 6,
+    "Jul": 7,
+    "Aug": 8,
+    "Sep": 9,
+    "Oct": 10,
+    "Nov": 11,
+    "Dec": 12,
+}
+
+
+class TimestampParser:
+    def __init__(self):
+        self._last_text = None
+        self._last_date = None
+
+    def __call__(self, text: str) -> datetime:
+        # The log only has a resolution of one second, so in a busy log a lot
+        # of lines in a row will share the exact same timestamp, in which case
+        # we can skip parsing entirely.
+        if text == self._last_text:
+            return self._last_date
+
+        date = self._parse(text)
+        self._last_text, self._last_date = text, date
+
+        return date
+
+    @staticmethod
+    def _parse(text: str) -> datetime:
+        # EverQuest always writes it's timestamps as a fixed width string, like
+        # "Sat Oct 24 03:34:26 2020", so we can just slice each field out
+        # directly rather than going through strptime. If we get anything that
+        # doesn't look like that, we'll fall back to strptime, which will also
+        # take care of raising a ValueError if it's not a timestamp at all.
+        if (
+            len(text) == 24
+            and text[3] == text[7] == text[10] == text[19] == " "
+            and text[13] == text[16] == ":"
+            and (month := _MONTHS.get(text[4:7])) is not None
+        ):
+            try:
+                return datetime(
+                    int(text[20:24]),
+                    month,
+                    int(text[8:10]),
+                    int(text[11:13]),
+                    int(text[14:16]),
+                    int(text[17:19]),
+                )
+            except ValueError:
+                pass
+
+        return datetime.strptime(text, TIMESTAMP_FORMAT)
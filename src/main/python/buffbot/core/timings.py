@@ -0,0 +1,173 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import json
+import math
+import os
+import typing
+
+from datetime import timedelta
+
+import attr
+
+
+@attr.s(slots=True, auto_attribs=True, frozen=True)
+class TimingBounds:
+
+    timeout_min: timedelta = timedelta(seconds=3)
+    timeout_max: timedelta = timedelta(seconds=30)
+    pause_min: timedelta = timedelta(seconds=1)
+    pause_max: timedelta = timedelta(seconds=10)
+
+
+def _percentile(samples: typing.List[float], percentile: float) -> float:
+    ordered = sorted(samples)
+    return ordered[
+        min(len(ordered) - 1, math.ceil(len(ordered) * percentile / 100) - 1)
+    ]
+
+
+def _clamp(value: timedelta, low: timedelta, high: timedelta) -> timedelta:
+    return max(low, min(high, value))
+
+
+class SpellTimings:
+    def __init__(
+        self,
+        filename: typing.Optional[os.PathLike] = None,
+        *,
+        bounds: TimingBounds = TimingBounds(),
+        timeout_percentile: float = 99,
+        pause_percentile: float = 95,
+        slack: timedelta = timedelta(seconds=2),
+        min_samples: int = 5,
+        window: int = 200,
+    ):
+        self.filename = filename
+        self.bounds = bounds
+        self.timeout_percentile = timeout_percentile
+        self.pause_percentile = pause_percentile
+        self.slack = slack
+        self.min_samples = min_samples
+        self.window = window
+
+        # For each spell we keep a window of the most recent samples, in
+        # seconds, of how long it took from us starting to cast it to hearing
+        # back whether it landed, and how soon after it finished the next spell
+        # was able to start. Only the most recent samples are kept, so that our
+        # estimates follow changes to gear, lag, or anything else.
+        self._confirm: typing.Dict[str, typing.Deque[float]] = {}
+        self._recovery: typing.Dict[str, typing.Deque[float]] = {}
+        self._estimates: typing.Dict[typing.Tuple[str, str], timedelta] = {}
+        self._dirty = False
+
+        if filename is not None:
+            self.load()
+
+    def __repr__(self):
+        return f"<SpellTimings (spells={sorted(self._confirm)!r})>"
+
+    def _record(self, samples, name: str, value: timedelta):
+        if (window := samples.get(name)) is None:
+            window = samples[name] = collections.deque(maxlen=self.window)
+        window.append(max(0.0, value.total_seconds()))
+        for key in [k for k in self._estimates if k[:2] == (id(samples), name)]:
+            del self._estimates[key]
+        self._dirty = True
+
+    def confirmed(self, name: str, latency: timedelta):
+        self._record(self._confirm, name, latency)
+
+    def recovered(self, name: str, gap: timedelta):
+        self._record(self._recovery, name, gap)
+
+    def _estimate(self, samples, name: str, percentile: float):
+        key = (id(samples), name, percentile)
+        if (estimate := self._estimates.get(key)) is None:
+            window = samples.get(name)
+            if window is None or len(window) < self.min_samples:
+                return None
+            estimate = self._estimates[key] = timedelta(
+                seconds=_percentile(list(window), percentile)
+            )
+        return estimate
+
+    def timeout(self, name: str, default: timedelta) -> timedelta:
+        # Until we've seen enough casts of a spell, we stick with the default,
+        # afterwards we'll wait for nearly every cast we've seen to have been
+        # confirmed, plus some slack since log timestamps are only to the second.
+        if (
+            estimate := self._estimate(self._confirm, name, self.timeout_percentile)
+        ) is None:
+            return default
+        return _clamp(
+            estimate + self.slack, self.bounds.timeout_min, self.bounds.timeout_max
+        )
+
+    def pause(self, name: str, default: timedelta) -> timedelta:
+        if (
+            estimate := self._estimate(self._recovery, name, self.pause_percentile)
+        ) is None:
+            return default
+        return _clamp(estimate, self.bounds.pause_min, self.bounds.pause_max)
+
+    def typical(self, name: str) -> typing.Optional[timedelta]:
+        # How long a cast of this spell usually takes to land.
+        return self._estimate(self._confirm, name, 50)
+
+    def estimates(self, name: str) -> typing.Dict[str, typing.Optional[float]]:
+        confirm = self._estimate(self._confirm, name, self.timeout_percentile)
+        recovery = self._estimate(self._recovery, name, self.pause_percentile)
+        return {
+            "confirm": confirm.total_seconds() if confirm is not None else None,
+            "recovery": recovery.total_seconds() if recovery is not None else None,
+        }
+
+    def load(self):
+        # Like a checkpoint, anything wrong with our saved timings just means
+        # that we start learning them over again.
+        try:
+            with open(self.filename, encoding="utf8") as fp:
+                data = json.load(fp)
+            for name, spell in data.items():
+                for samples, key in [
+                    (self._confirm, "confirm"),
+                    (self._recovery, "recovery"),
+                ]:
+                    samples[name] = collections.deque(
+                        (float(v) for v in spell.get(key, [])), maxlen=self.window
+                    )
+        except (OSError, ValueError, TypeError, AttributeError):
+            self._confirm.clear()
+            self._recovery.clear()
+        self._estimates.clear()
+        self._dirty = False
+
+    def save(self, *, force: bool = False):
+        if self.filename is None or not (self._dirty or force):
+            return
+
+        data = {
+            name: {
+                "confirm": list(self._confirm.get(name, [])),
+                "recovery": list(self._recovery.get(name, [])),
+            }
+            for name in sorted(set(self._confirm) | set(self._recovery))
+        }
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.filename)), exist_ok=True)
+        tmp = f"{self.filename}.tmp"
+        with open(tmp, "w", encoding="utf8") as fp:
+            json.dump(data, fp)
+        os.replace(tmp, self.filename)
+        self._dirty = False
@@ -0,0 +1,114 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import json
+import os
+import random
+import threading
+import time
+import typing
+
+
+class _Stage:
+
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+
+class Tracer:
+    def __init__(
+        self,
+        *,
+        sample_rate: float = 0.0,
+        max_spans: int = 10_000,
+        seed: typing.Optional[int] = None,
+    ):
+        self.sample_rate = sample_rate
+
+        # Tracing is opt in, and anything that wants to be traced checks for a
+        # tracer before ever calling into us, so none of this costs anything
+        # unless someone has asked for it. Stages are timed in nanoseconds, and
+        # a sample of those timings are also kept as individual spans, in a
+        # bounded buffer so that a long session can't grow it forever.
+        self._stages: typing.Dict[str, _Stage] = collections.defaultdict(_Stage)
+        self._counters: typing.Dict[str, int] = collections.Counter()
+        self._spans: typing.Deque[typing.Tuple[str, int, int]] = collections.deque(
+            maxlen=max_spans
+        )
+        self._random = random.Random(seed).random
+        self._started = time.perf_counter_ns()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"<Tracer (sample_rate={self.sample_rate!r})>"
+
+    now = staticmethod(time.perf_counter_ns)
+
+    def count(self, name: str, n: int = 1):
+        with self._lock:
+            self._counters[name] += n
+
+    def record(self, name: str, start: int, end: typing.Optional[int] = None):
+        # Record the time taken by a stage, from a start (and optionally end)
+        # taken from Tracer.now().
+        if end is None:
+            end = time.perf_counter_ns()
+        self.observe(name, end - start, start=start)
+
+    def observe(self, name: str, duration: int, *, start: typing.Optional[int] = None):
+        with self._lock:
+            stage = self._stages[name]
+            stage.count += 1
+            stage.total += duration
+            if duration > stage.max:
+                stage.max = duration
+
+            if self.sample_rate and self._random() < self.sample_rate:
+                if start is None:
+                    start = time.perf_counter_ns() - duration
+                self._spans.append((name, start - self._started, duration))
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self._counters.clear()
+            self._spans.clear()
+            self._started = time.perf_counter_ns()
+
+    def snapshot(self) -> typing.Dict[str, typing.Any]:
+        with self._lock:
+            return {
+                "elapsed_ns": time.perf_counter_ns() - self._started,
+                "stages": {
+                    name: {
+                        "count": stage.count,
+                        "total_ns": stage.total,
+                        "mean_ns": stage.total / stage.count if stage.count else 0.0,
+                        "max_ns": stage.max,
+                    }
+                    for name, stage in sorted(self._stages.items())
+                },
+                "counters": dict(sorted(self._counters.items())),
+                "spans": [
+                    {"name": name, "start_ns": start, "duration_ns": duration}
+                    for name, start, duration in self._spans
+                ],
+            }
+
+    def dump(self, filename: os.PathLike):
+        with open(filename, "w", encoding="utf8") as fp:
+            json.dump(self.snapshot(), fp, indent=2)
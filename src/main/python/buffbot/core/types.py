@@ -12,8 +12,10 @@
 
 from __future__ import annotations
 
+import datetime
 import enum
 import os
+import typing
 
 import attr
 
@@ -104,9 +106,18 @@ class Character:
         )
 
 
+class SpellScope(enum.Enum):
+    Single = "single"
+    Group = "group"
+
+
 @attr.s(slots=True, auto_attribs=True, frozen=True)
 class Spell:
 
     name: str
     gem: int
     success_message: str
+    duration: typing.Optional[datetime.timedelta] = attr.ib(default=None)
+    cast_time: typing.Optional[datetime.timedelta] = attr.ib(default=None)
+    recast: typing.Optional[datetime.timedelta] = attr.ib(default=None)
+    scope: SpellScope = attr.ib(default=SpellScope.Single)
@@ -12,6 +12,7 @@
 
 import os
 import string
+import time
 
 
 WINDOWS = os.name == "nt"
@@ -38,9 +39,9 @@ if WINDOWS:
             None,
         )
         detached_handle = handle.Detach()
-        fd = msvcrt.open_osfhandle(detached_handle, os.O_RDONLY)
+        fd = msvcrt.open_osfhandle(detached_handle, os.O_RDONLY | os.O_BINARY)
 
-        return open(fd, encoding="utf8")
+        return open(fd, "rb", buffering=0)
 
     _UPPERCASE_SYMBOLS = {
         "!": "1",
@@ -55,7 +56,7 @@ if WINDOWS:
         ")": "0",
     }
 
-    def _write_command_typed(command):
+    def type_command(command):
         for c in command:
             # Determine if this character needs the shift key entered or not,
             shifted = c in string.ascii_uppercase or c in _UPPERCASE_SYMBOLS
@@ -88,7 +89,7 @@ if WINDOWS:
         try:
             _write_command_paste(command)
         except pywintypes.error:
-            _write_command_typed(command)
+            type_command(command)
 
     def is_current_window(window_name):
         handle = win32gui.GetForegroundWindow()
@@ -100,7 +101,12 @@ if WINDOWS:
 else:
 
     def shared_open(filename):
-        return open(filename, encoding="utf8")
+        return open(filename, "rb", buffering=0)
+
+    def type_command(command):
+        raise NotImplementedError(
+            "Writing commands is not implemented for non Windows platforms."
+        )
 
     def write_command(command):
         raise NotImplementedError(
@@ -109,3 +115,41 @@ else:
 
     def is_current_window(window_name):
         return True
+
+
+class WindowFocus:
+    def __init__(self, window_name: str, *, interval: float = 0.5):
+        self.window_name = window_name
+        self.interval = interval
+
+        self.focused = False
+        self._checked = None
+
+    def __repr__(self):
+        return (
+            f"<{self.__class__.__name__} (window_name={self.window_name!r}, "
+            f"focused={self.focused!r})>"
+        )
+
+    def refresh(self, *, force: bool = False) -> bool:
+        # Asking the OS which window is in the foreground isn't free, so rather
+        # than asking for every line we read, we only ask at most once every
+        # interval, and everything in between just reads the focused attribute.
+        now = time.monotonic()
+        if force or self._checked is None or now - self._checked >= self.interval:
+            self.focused = self._check()
+            self._checked = now
+
+        return self.focused
+
+    def _check(self) -> bool:
+        return is_current_window(self.window_name)
+
+
+class FakeFocus(WindowFocus):
+    def __init__(self, focused: bool = True):
+        super().__init__("EverQuest")
+        self.focused = focused
+
+    def refresh(self, *, force: bool = False) -> bool:
+        return self.focused
@@ -0,0 +1,225 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import ctypes
+import ctypes.util
+import enum
+import functools
+import operator
+import os
+import struct
+import sys
+import typing
+
+
+class Change(enum.IntFlag):
+    # The file has had data written to it.
+    MODIFIED = 1
+    # The file has been replaced with a new file, and needs to be reopened.
+    REPLACED = 2
+
+
+def _combine(changes: typing.Dict[os.PathLike, Change]) -> Change:
+    return functools.reduce(operator.or_, changes.values(), Change(0))
+
+
+class PollingWatcher:
+    def __init__(
+        self, filename: typing.Optional[os.PathLike] = None, *, interval: float = 0.25
+    ):
+        self.interval = interval
+
+        self._stats: typing.Dict[os.PathLike, typing.Optional[os.stat_result]] = {}
+        if filename is not None:
+            self.add(filename)
+
+    def __repr__(self):
+        return f"<PollingWatcher (filenames={self.filenames!r})>"
+
+    @property
+    def filenames(self) -> typing.List[os.PathLike]:
+        return list(self._stats)
+
+    def add(self, filename: os.PathLike):
+        self._stats[filename] = self._current_stat(filename)
+
+    def remove(self, filename: os.PathLike):
+        self._stats.pop(filename, None)
+
+    def close(self):
+        pass
+
+    @staticmethod
+    def _current_stat(filename):
+        try:
+            return os.stat(filename)
+        except FileNotFoundError:
+            return None
+
+    def _check(self) -> typing.Dict[os.PathLike, Change]:
+        changes = {}
+        for filename, previous in self._stats.items():
+            current = self._stats[filename] = self._current_stat(filename)
+
+            if current is None:
+                continue
+            elif previous is None or (
+                (previous.st_dev, previous.st_ino) != (current.st_dev, current.st_ino)
+                or current.st_size < previous.st_size
+            ):
+                changes[filename] = Change.REPLACED
+            elif (current.st_size, current.st_mtime_ns) != (
+                previous.st_size,
+                previous.st_mtime_ns,
+            ):
+                changes[filename] = Change.MODIFIED
+
+        return changes
+
+    async def wait_many(self) -> typing.Dict[os.PathLike, Change]:
+        while not (changes := self._check()):
+            await asyncio.sleep(self.interval)
+        return changes
+
+    async def wait(self) -> Change:
+        return _combine(await self.wait_many())
+
+
+class InotifyWatcher:
+
+    IN_MODIFY = 0x00000002
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+
+    _event = struct.Struct("iIII")
+
+    def __init__(self, filename: typing.Optional[os.PathLike] = None):
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        # We watch directories rather than the files themselves, so that we'll
+        # find out when a file is deleted and created again. Every file we're
+        # watching in a directory shares that directory's watch, and all of
+        # them share the one inotify instance, so watching another file costs
+        # at most one more watch, and never another wakeup.
+        self._directories: typing.Dict[str, int] = {}
+        self._watches: typing.Dict[int, typing.Dict[bytes, os.PathLike]] = {}
+        self._changes: typing.Dict[os.PathLike, Change] = {}
+        self._ready = None
+        self._loop = None
+
+        if filename is not None:
+            try:
+                self.add(filename)
+            except OSError:
+                os.close(self._fd)
+                raise
+
+    def __repr__(self):
+        return f"<InotifyWatcher (filenames={self.filenames!r})>"
+
+    @property
+    def filenames(self) -> typing.List[os.PathLike]:
+        return [f for names in self._watches.values() for f in names.values()]
+
+    def add(self, filename: os.PathLike):
+        directory = os.path.dirname(os.path.abspath(filename))
+        if (wd := self._directories.get(directory)) is None:
+            wd = self._libc.inotify_add_watch(
+                self._fd,
+                os.fsencode(directory),
+                self.IN_MODIFY | self.IN_CREATE | self.IN_MOVED_TO,
+            )
+            if wd < 0:
+                errno = ctypes.get_errno()
+                raise OSError(errno, f"inotify_add_watch failed for {directory}")
+            self._directories[directory] = wd
+
+        names = self._watches.setdefault(wd, {})
+        names[os.fsencode(os.path.basename(filename))] = filename
+
+    def remove(self, filename: os.PathLike):
+        directory = os.path.dirname(os.path.abspath(filename))
+        if (wd := self._directories.get(directory)) is None:
+            return
+
+        names = self._watches[wd]
+        names.pop(os.fsencode(os.path.basename(filename)), None)
+        self._changes.pop(filename, None)
+        if not names:
+            self._libc.inotify_rm_watch(self._fd, wd)
+            del self._directories[directory]
+            del self._watches[wd]
+
+    def close(self):
+        if self._loop is not None:
+            self._loop.remove_reader(self._fd)
+            self._loop = None
+        os.close(self._fd)
+
+    def _on_readable(self):
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return
+
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = self._event.unpack_from(data, offset)
+            offset += self._event.size
+            name = data[offset : offset + length].rstrip(b"\0")
+            offset += length
+
+            if (filename := self._watches.get(wd, {}).get(name)) is None:
+                continue
+
+            changes = self._changes.get(filename, Change(0))
+            if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                changes |= Change.REPLACED
+            if mask & self.IN_MODIFY:
+                changes |= Change.MODIFIED
+            self._changes[filename] = changes
+
+        if self._changes:
+            self._ready.set()
+
+    async def wait_many(self) -> typing.Dict[os.PathLike, Change]:
+        if self._loop is None:
+            self._ready = asyncio.Event()
+            self._loop = asyncio.get_running_loop()
+            self._loop.add_reader(self._fd, self._on_readable)
+
+        await self._ready.wait()
+        self._ready.clear()
+        changes, self._changes = self._changes, {}
+
+        return changes
+
+    async def wait(self) -> Change:
+        return _combine(await self.wait_many())
+
+
+def watcher_for(
+    filename: typing.Optional[os.PathLike] = None,
+) -> typing.Union[InotifyWatcher, PollingWatcher]:
+    # Use inotify if we can, which lets us sleep until the file actually
+    # changes, otherwise we'll fall back to checking it periodically.
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(filename)
+        except (OSError, AttributeError):
+            pass
+
+    return PollingWatcher(filename)
@@ -0,0 +1,245 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import signal
+import typing
+
+from datetime import timedelta
+
+from buffbot.core.buffqueue import DropPolicy
+from buffbot.core.coordinator import CoordinatorClient
+from buffbot.core.groups import GroupRoster
+from buffbot.core.metrics import MetricsRegistry, MetricsServer
+from buffbot.core.output import LoggingBackend
+from buffbot.core.planner import CastPlanner
+from buffbot.core.supervisor import Supervisor
+from buffbot.core.timings import SpellTimings, TimingBounds
+from buffbot.core.trace import Tracer
+from buffbot.core.types import Spell, SpellScope
+
+logger = logging.getLogger("buffbot")
+
+
+def load_config(filename: os.PathLike) -> typing.Dict[str, typing.Any]:
+    # The configuration is a JSON file, which looks like:
+    #
+    #   {
+    #       "log": "C:/EverQuest/Logs/eqlog_Buffbot_xegony.txt",
+    #       "spells": [
+    #           {
+    #               "name": "Aegolism",
+    #               "gem": 1,
+    #               "success_message": "{target} ...",
+    #               "duration": 9000,
+    #               "cast_time": 5,
+    #               "recast": 0,
+    #               "scope": "single"
+    #           }
+    #       ],
+    #       "acls": ["Soandso"],
+    #       "checkpoint": "C:/BuffBot/eqlog_Buffbot_xegony.json",
+    #       "catch_up": 300,
+    #       "refresh_margin": 60,
+    #       "queue_maxlen": 100,
+    #       "queue_policy": "lowest",
+    #       "window": "EverQuest",
+    #       "coordinator": "/tmp/buffbot.sock",
+    #       "timings": "C:/BuffBot/eqlog_Buffbot_xegony.timings.json",
+    #       "timing_bounds": {
+    #           "timeout_min": 3,
+    #           "timeout_max": 30,
+    #           "pause_min": 1,
+    #           "pause_max": 10
+    #       },
+    #       "plan_ahead": 4,
+    #       "groups": [["Soandso", "Otherguy", "Thirdwheel"]]
+    #   }
+    #
+    # Everything other than the log is optional, though when running more than
+    # one character each of them needs its own window. On start up, we resume
+    # from the checkpoint if it still matches the log, but never catch up on more
+    # than the last catch_up seconds of it (5 minutes, unless given, null for no
+    # limit).
+    # Characters that are given the same coordinator share one buff queue, see
+    # python -m buffbot.core.coordinator. Timeouts and pauses are learned for
+    # each spell, within the timing bounds, and saved to timings if given.
+    # When more than one person is waiting, the order of our next plan_ahead
+    # casts is planned across all of them, using each spell's cast_time and
+    # recast (or what we've learned about them), and 0 buffs one person at a
+    # time, in the order they asked. A spell with a "group" scope is only cast
+    # once for everyone waiting who is in the same group, according to groups,
+    # or to our own group as we see people join and leave it in the log.
+    with open(filename, encoding="utf8") as fp:
+        data = json.load(fp)
+
+    return {
+        "filename": data["log"],
+        "spells": [
+            Spell(
+                name=spell["name"],
+                gem=int(spell["gem"]),
+                success_message=spell["success_message"],
+                duration=_seconds(spell.get("duration")),
+                cast_time=_seconds(spell.get("cast_time")),
+                recast=_seconds(spell.get("recast")),
+                scope=SpellScope(spell.get("scope", "single")),
+            )
+            for spell in data.get("spells", [])
+        ],
+        "acls": list(data.get("acls", [])),
+        "checkpoint": data.get("checkpoint"),
+        "catch_up": _seconds(data.get("catch_up", 300)),
+        "refresh_margin": timedelta(seconds=data.get("refresh_margin", 60)),
+        "queue_maxlen": data.get("queue_maxlen"),
+        "queue_policy": DropPolicy(data.get("queue_policy", "newest")),
+        "window": data.get("window", "EverQuest"),
+        "timings": SpellTimings(
+            data.get("timings"),
+            bounds=TimingBounds(
+                **{
+                    k: timedelta(seconds=v)
+                    for k, v in data.get("timing_bounds", {}).items()
+                }
+            ),
+        ),
+        "coordinator": (
+            CoordinatorClient(data["coordinator"])
+            if data.get("coordinator") is not None
+            else None
+        ),
+        "planner": (
+            CastPlanner(horizon=horizon)
+            if (horizon := data.get("plan_ahead", 4))
+            else None
+        ),
+        "roster": GroupRoster(data.get("groups", [])),
+    }
+
+
+def _seconds(value) -> typing.Optional[timedelta]:
+    return timedelta(seconds=value) if value is not None else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m buffbot",
+        description="Run BuffBot without a user interface.",
+    )
+    parser.add_argument(
+        "config",
+        nargs="+",
+        help="a JSON file with a bot's configuration, one for each character",
+    )
+    parser.add_argument(
+        "--log",
+        help="the eqlog file to watch, overrides the config (with one config only)",
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="FILE",
+        help="time each stage of processing, and write the timings to FILE on exit",
+    )
+    parser.add_argument(
+        "--metrics",
+        metavar="[HOST:]PORT",
+        help="serve Prometheus metrics on http://HOST:PORT/metrics",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="log the commands that would be sent, instead of sending them",
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        format="[%(asctime)s] %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+        level=logging.INFO,
+    )
+
+    if args.log and len(args.config) > 1:
+        parser.error("--log can only be used with a single config")
+
+    kwargs = {}
+    if args.dry_run:
+        kwargs["backend"] = lambda: LoggingBackend(logger.info)
+    if args.trace:
+        kwargs["tracer"] = Tracer()
+    server = None
+    if args.metrics:
+        host, _, port = args.metrics.rpartition(":")
+        kwargs["metrics"] = MetricsRegistry()
+        server = MetricsServer(kwargs["metrics"], host or "127.0.0.1", int(port))
+        server.start()
+    supervisor = Supervisor(logger=logger.info, **kwargs)
+
+    bots = {}
+    for path in args.config:
+        config = load_config(path)
+        if args.log:
+            config["filename"] = args.log
+
+        try:
+            bot = supervisor.add(**config)
+        except ValueError as exc:
+            supervisor.close()
+            parser.error(f"{path}: {exc}")
+        bots[path] = bot
+        logger.info(
+            "Monitoring %s as %s (%s)",
+            bot.filename,
+            bot.character.name,
+            bot.character.server_display,
+        )
+
+    def reload():
+        for path, bot in bots.items():
+            new = load_config(path)
+            bot.reconfigure(spells=new["spells"], acls=new["acls"])
+            logger.info("Reloaded spells and ACLs from %s", path)
+
+    try:
+        asyncio.run(_run(supervisor, reload))
+    finally:
+        if supervisor.tracer is not None:
+            supervisor.tracer.dump(args.trace)
+        if server is not None:
+            server.close()
+
+
+async def _run(supervisor, reload):
+    # Make sure that being asked to stop shuts us down cleanly, so that we get a
+    # chance to save where we were in the log.
+    task = asyncio.current_task()
+    loop = asyncio.get_running_loop()
+    handlers = [(signal.SIGINT, task.cancel), (signal.SIGTERM, task.cancel)]
+
+    # Where we have it, SIGHUP reloads the spells and ACLs from our config
+    # without restarting.
+    if hasattr(signal, "SIGHUP"):
+        handlers.append((signal.SIGHUP, reload))
+
+    for signum, handler in handlers:
+        try:
+            loop.add_signal_handler(signum, handler)
+        except (NotImplementedError, RuntimeError):
+            pass
+
+    try:
+        await supervisor.run()
+    except asyncio.CancelledError:
+        pass
@@ -0,0 +1,375 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import concurrent.futures
+import functools
+import logging
+import sqlite3
+import threading
+import typing
+
+from datetime import timedelta
+
+from buffbot.core.types import Character, Spell, SpellScope
+
+logger = logging.getLogger("buffbot")
+
+# Each migration brings the database from the version before it, to the version
+# that it's at in this list (plus one), and is run in a single transaction.
+# Databases created before we tracked versions already have the tables from the
+# first migration, which is why it only creates them if they don't exist.
+MIGRATIONS = [
+    [
+        """ CREATE TABLE IF NOT EXISTS state (
+                key text NOT NULL UNIQUE,
+                value text NOT NULL
+            )
+        """,
+        """ CREATE TABLE IF NOT EXISTS spells (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                character text NOT NULL,
+                server text NOT NULL,
+                gem INTEGER NOT NULL,
+                name text NOT NULL,
+                success_message text NOT NULL
+            )
+        """,
+        """ CREATE TABLE IF NOT EXISTS acls (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                character text NOT NULL,
+                server text NOT NULL,
+                entry text NOT NULL
+            )
+        """,
+    ],
+    [
+        "CREATE INDEX IF NOT EXISTS spells_character ON spells (character, server)",
+        "CREATE INDEX IF NOT EXISTS acls_character ON acls (character, server)",
+    ],
+    ["ALTER TABLE spells ADD COLUMN duration INTEGER"],
+    [
+        "ALTER TABLE spells ADD COLUMN cast_time REAL",
+        "ALTER TABLE spells ADD COLUMN recast REAL",
+        "ALTER TABLE spells ADD COLUMN scope text",
+    ],
+]
+
+# A configured spell or ACL entry, along with the id of the row it's stored in.
+SpellRecord = typing.Tuple[Spell, int]
+ACLRecord = typing.Tuple[str, int]
+
+
+class CharacterConfig:
+    def __init__(self):
+        self.spells: typing.List[SpellRecord] = []
+        self.acls: typing.List[ACLRecord] = []
+
+    def __repr__(self):
+        return f"<CharacterConfig (spells={self.spells!r}, acls={self.acls!r})>"
+
+
+class ConfigStore:
+    def __init__(self, filename: str):
+        self.filename = filename
+
+        # All access to the database happens on a single thread of its own, so
+        # that whoever is using us, typically the UI thread, never has to wait
+        # on the disk. Reads are served from our in-memory cache, which is
+        # loaded in bulk up front, and writes update the cache immediately and
+        # are then written out in the background. New rows are the exception,
+        # since we don't know their id until they've been written, so they're
+        # added to the cache once they have been, which means that listeners
+        # can be called from our database thread.
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="buffbot-config"
+        )
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._listeners: typing.List[typing.Callable[[Character], None]] = []
+
+        self._state, self._configs = self._executor.submit(self._open).result()
+
+    def __repr__(self):
+        return f"<ConfigStore (filename={self.filename!r})>"
+
+    def close(self):
+        self._executor.submit(self._close).result()
+        self._executor.shutdown()
+
+    def subscribe(self, listener: typing.Callable[[Character], None]):
+        self._listeners.append(listener)
+
+    def _notify(self, char: Character):
+        for listener in self._listeners:
+            listener(char)
+
+    # Reading from the cache.
+
+    def get_state(self, key: str) -> typing.Optional[str]:
+        return self._state.get(key)
+
+    def spells(self, char: Character) -> typing.List[SpellRecord]:
+        with self._lock:
+            return list(self._config(char).spells)
+
+    def acls(self, char: Character) -> typing.List[ACLRecord]:
+        with self._lock:
+            return list(self._config(char).acls)
+
+    def _config(self, char: Character) -> CharacterConfig:
+        key = (char.name, char.server.value)
+        if (config := self._configs.get(key)) is None:
+            config = self._configs[key] = CharacterConfig()
+        return config
+
+    # Writing, through the cache.
+
+    def set_state(self, key: str, value: str):
+        self._state[key] = value
+        self._write(
+            """ INSERT INTO state (key, value) VALUES (?, ?)
+                ON CONFLICT (key) DO UPDATE SET value = excluded.value
+            """,
+            (key, value),
+        )
+
+    def add_spell(self, char: Character, spell: Spell):
+        self._write(
+            """ INSERT INTO spells
+                    (
+                        character, server, gem, name, success_message, duration,
+                        cast_time, recast, scope
+                    )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (char.name, char.server.value, *self._spell_values(spell)),
+            char,
+        ).add_done_callback(functools.partial(self._added, char, "spells", spell))
+
+    def update_spell(self, char: Character, row_id: int, spell: Spell):
+        with self._lock:
+            records = self._config(char).spells
+            records[:] = [(spell if i == row_id else s, i) for s, i in records]
+        self._write(
+            """ UPDATE spells
+                SET gem = ?, name = ?, success_message = ?, duration = ?,
+                    cast_time = ?, recast = ?, scope = ?
+                WHERE id = ?
+            """,
+            (*self._spell_values(spell), row_id),
+            char,
+        )
+        self._notify(char)
+
+    def remove_spell(self, char: Character, row_id: int):
+        with self._lock:
+            records = self._config(char).spells
+            records[:] = [(s, i) for s, i in records if i != row_id]
+        self._write("DELETE FROM spells WHERE id = ?", (row_id,), char)
+        self._notify(char)
+
+    def save_spells(self, char: Character, spells: typing.List[Spell]):
+        # Replace all of a character's spells in one go.
+        self._bulk_replace(
+            char,
+            "spells",
+            """ INSERT INTO spells
+                    (
+                        character, server, gem, name, success_message, duration,
+                        cast_time, recast, scope
+                    )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            [(char.name, char.server.value, *self._spell_values(s)) for s in spells],
+        )
+        with self._lock:
+            self._config(char).spells = self._load_spells(char)
+        self._notify(char)
+
+    def add_acl(self, char: Character, entry: str):
+        self._write(
+            "INSERT INTO acls (character, server, entry) VALUES (?, ?, ?)",
+            (char.name, char.server.value, entry),
+            char,
+        ).add_done_callback(functools.partial(self._added, char, "acls", entry))
+
+    def remove_acl(self, char: Character, row_id: int):
+        with self._lock:
+            records = self._config(char).acls
+            records[:] = [(e, i) for e, i in records if i != row_id]
+        self._write("DELETE FROM acls WHERE id = ?", (row_id,), char)
+        self._notify(char)
+
+    def save_acls(self, char: Character, entries: typing.List[str]):
+        self._bulk_replace(
+            char,
+            "acls",
+            "INSERT INTO acls (character, server, entry) VALUES (?, ?, ?)",
+            [(char.name, char.server.value, entry) for entry in entries],
+        )
+        with self._lock:
+            self._config(char).acls = self._load_acls(char)
+        self._notify(char)
+
+    @staticmethod
+    def _spell_values(spell: Spell):
+        def seconds(value):
+            return value.total_seconds() if value is not None else None
+
+        duration = (
+            int(spell.duration.total_seconds()) if spell.duration is not None else None
+        )
+        return (
+            spell.gem,
+            spell.name,
+            spell.success_message,
+            duration,
+            seconds(spell.cast_time),
+            seconds(spell.recast),
+            spell.scope.value,
+        )
+
+    def _write(self, sql, params, char=None) -> concurrent.futures.Future:
+        future = self._executor.submit(self._execute, sql, params)
+        future.add_done_callback(functools.partial(self._written, char))
+        return future
+
+    def _written(self, char, future):
+        # Since nobody waits on our writes, if one of them fails, then our cache
+        # no longer matches the database, so we'll reload it from what actually
+        # made it in.
+        if (error := future.exception()) is not None:
+            logger.error("Could not save the configuration: %s", error)
+            self._executor.submit(self._reload, char)
+
+    def _added(self, char, kind, item, future):
+        if future.exception() is None:
+            with self._lock:
+                getattr(self._config(char), kind).append((item, future.result()))
+            self._notify(char)
+
+    def _bulk_replace(self, char, table, sql, rows):
+        self._executor.submit(self._replace, char, table, sql, rows).result()
+
+    def _load_spells(self, char):
+        rows = self._executor.submit(
+            self._select,
+            """ SELECT
+                    id, gem, name, success_message, duration, cast_time, recast, scope
+                FROM spells
+                WHERE character = ? AND server = ? ORDER BY id
+            """,
+            (char.name, char.server.value),
+        ).result()
+        return [(self._spell(*values), row_id) for row_id, *values in rows]
+
+    def _load_acls(self, char):
+        rows = self._executor.submit(
+            self._select,
+            """ SELECT id, entry FROM acls
+                WHERE character = ? AND server = ? ORDER BY id
+            """,
+            (char.name, char.server.value),
+        ).result()
+        return [(entry, row_id) for row_id, entry in rows]
+
+    # Everything below here only ever runs on our database thread.
+
+    def _open(self):
+        db = self._local.db = sqlite3.connect(self.filename, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+
+        version = db.execute("PRAGMA user_version").fetchone()[0]
+        for number, statements in enumerate(MIGRATIONS[version:], start=version + 1):
+            db.execute("BEGIN")
+            try:
+                for statement in statements:
+                    db.execute(statement)
+                # PRAGMA doesn't support parameters, but number is always an int.
+                db.execute(f"PRAGMA user_version = {int(number)}")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+
+        return self._load()
+
+    def _reload(self, char):
+        state, configs = self._load()
+        with self._lock:
+            self._state, self._configs = state, configs
+        if char is not None:
+            self._notify(char)
+
+    def _load(self):
+        db = self._local.db
+        state = dict(db.execute("SELECT key, value FROM state"))
+
+        configs: typing.Dict[typing.Tuple[str, str], CharacterConfig] = {}
+        for row_id, name, server, *values in db.execute(
+            """ SELECT
+                    id, character, server, gem, name, success_message, duration,
+                    cast_time, recast, scope
+                FROM spells ORDER BY id
+            """
+        ):
+            configs.setdefault((name, server), CharacterConfig()).spells.append(
+                (self._spell(*values), row_id)
+            )
+        for row_id, name, server, entry in db.execute(
+            "SELECT id, character, server, entry FROM acls ORDER BY id"
+        ):
+            configs.setdefault((name, server), CharacterConfig()).acls.append(
+                (entry, row_id)
+            )
+
+        return state, configs
+
+    def _close(self):
+        self._local.db.close()
+
+    def _execute(self, sql, params):
+        return self._local.db.execute(sql, params).lastrowid
+
+    def _replace(self, char, table, sql, rows):
+        db = self._local.db
+        db.execute("BEGIN")
+        try:
+            # The table name comes from us, never from user input.
+            db.execute(
+                f"DELETE FROM {table} WHERE character = ? AND server = ?",
+                (char.name, char.server.value),
+            )
+            db.executemany(sql, rows)
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    def _select(self, sql, params):
+        return self._local.db.execute(sql, params).fetchall()
+
+    @staticmethod
+    def _spell(gem, name, message, duration, cast_time, recast, scope):
+        def seconds(value):
+            return timedelta(seconds=value) if value is not None else None
+
+        # Spells saved before we knew about scopes are all single target.
+        return Spell(
+            name=name,
+            gem=gem,
+            success_message=message,
+            duration=seconds(duration),
+            cast_time=seconds(cast_time),
+            recast=seconds(recast),
+            scope=SpellScope(scope) if scope is not None else SpellScope.Single,
+        )
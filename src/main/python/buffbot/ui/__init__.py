@@ -11,15 +11,18 @@
 # limitations under the License.
 
 import datetime
+import math
 import os
 import pathlib
 import sys
 
+
 from client_config import ClientConfig
-from PyQt5 import QtSql
 from PyQt5.QtCore import (
     QAbstractListModel,
+    QAbstractTableModel,
     QFileSystemWatcher,
+    QModelIndex,
     QObject,
     QStandardPaths,
     Qt,
@@ -31,13 +34,18 @@ from PyQt5.QtWidgets import (
     QApplication,
     QDialog,
     QFileDialog,
+    QLabel,
     QMainWindow,
     QMessageBox,
-    QTableWidgetItem,
 )
 from pyupdater.client import Client
 
-from buffbot.core import BuffBot, Character, Spell
+from buffbot.core import BuffBot, Character, Spell, SpellScope
+from buffbot.core.latency import format_summary
+from buffbot.core.metrics import MetricsRegistry, MetricsServer
+from buffbot.core.planner import CastPlanner
+from buffbot.core.timings import SpellTimings
+from buffbot.store import ConfigStore
 from buffbot.ui.generated.add_acl import Ui_AddACL
 from buffbot.ui.generated.add_spell import Ui_AddSpell
 from buffbot.ui.generated.main_window import Ui_MainWindow
@@ -45,31 +53,60 @@ from buffbot.ui.generated.main_window import Ui_MainWindow
 
 class Worker(QObject):
 
+    # How often, in milliseconds, we'll send our log messages over to the UI
+    # thread, so that a busy log doesn't turn into one signal per line.
+    _log_interval = 100
+
     started = pyqtSignal()
     finished = pyqtSignal()
     characterDetails = pyqtSignal(Character)
     monitoringFile = pyqtSignal(str)
-    logMessage = pyqtSignal(datetime.datetime, str)
+    logMessages = pyqtSignal(list)
+    latencySummary = pyqtSignal(dict)
 
     _stopping = pyqtSignal()
     _configure = pyqtSignal(str, list, list)
+    _logged = pyqtSignal(object, str)
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
         self._buffbot = None
+        self._logs = []
+        self._latency_count = 0
+
+        # Metrics are always collected, since it only costs a few increments,
+        # but are only served if we've been asked to with BUFFBOT_METRICS, set
+        # to the [HOST:]PORT to listen on.
+        self.metrics = MetricsRegistry()
+        self._metrics_server = None
 
     def start(self):
         self._stopping.connect(self._do_stop)
         self._configure.connect(self._do_create_bot)
+        self._logged.connect(self._queue_log)
 
+        # Rather than polling the bot, we use a single shot timer that we set
+        # to fire whenever the bot next has something to do.
         self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
         self._timer.timeout.connect(self._process_only)
 
+        self._log_timer = QTimer(self)
+        self._log_timer.setSingleShot(True)
+        self._log_timer.timeout.connect(self._flush_logs)
+
         self._watcher = QFileSystemWatcher(self)
         self._watcher.fileChanged.connect(self._read_and_process)
         self._watcher.directoryChanged.connect(self._check_for_monitored)
 
+        if address := os.environ.get("BUFFBOT_METRICS"):
+            host, _, port = address.rpartition(":")
+            self._metrics_server = MetricsServer(
+                self.metrics, host or "127.0.0.1", int(port)
+            )
+            self._metrics_server.start()
+
         self.started.emit()
 
     def _do_stop(self):
@@ -81,6 +118,12 @@ class Worker(QObject):
         if self._buffbot is not None:
             self._buffbot.close()
 
+        self._log_timer.stop()
+        self._flush_logs()
+
+        if self._metrics_server is not None:
+            self._metrics_server.close()
+
         self.finished.emit()
 
     def stop(self):
@@ -92,15 +135,17 @@ class Worker(QObject):
         # existing buffbot, and set it to None so that a new one can be
         # created later.
         if self._buffbot is not None:
-            if (
-                not os.path.samefile(filename, self._buffbot.filename)
-                or self._buffbot.spells != spells
-                or self._buffbot.acls != acls
-            ):
+            # Spells and ACLs can be changed on a running bot, so we only need
+            # to start over if we've been pointed at a different file.
+            if os.path.samefile(filename, self._buffbot.filename):
+                self._buffbot.reconfigure(spells=spells, acls=acls)
+                self._process_only()
+            else:
                 self._watcher.removePath(self._buffbot.filename)
                 self._watcher.removePath(os.path.dirname(self._buffbot.filename))
                 self._timer.stop()
 
+                self.metrics.remove(self._buffbot.metrics)
                 self._buffbot.close()
                 self._buffbot = None
 
@@ -108,17 +153,37 @@ class Worker(QObject):
         # or because the file has changed, then create a new one and
         # start watching the file and the directory containing that file.
         if self._buffbot is None:
+            # We keep track of how far into each log file we've gotten, so that
+            # when we're restarted we can pick up anyone who hailed us while we
+            # were gone, as long as it wasn't too long ago.
+            appdir = QStandardPaths.writableLocation(QStandardPaths.AppDataLocation)
+            checkpoint = os.path.join(
+                appdir, "checkpoints", f"{os.path.basename(filename)}.json"
+            )
+            timings = os.path.join(
+                appdir, "timings", f"{os.path.basename(filename)}.json"
+            )
+            char = Character.from_filename(filename)
+
+            self._latency_count = 0
             self._buffbot = BuffBot(
                 filename=filename,
                 spells=spells,
                 acls=acls,
                 logger=self._callback,
+                checkpoint=checkpoint,
+                catch_up=datetime.timedelta(minutes=5),
+                timings=SpellTimings(timings),
+                planner=CastPlanner(),
+                metrics=self.metrics.create(
+                    character=char.name, server=char.server.value
+                ),
             )
             self.characterDetails.emit(self._buffbot.character)
             self._buffbot.load()
             self._watcher.addPath(filename)
             self._watcher.addPath(os.path.dirname(filename))
-            self._timer.start(1000)
+            self._schedule()
 
             self.monitoringFile.emit(filename)
 
@@ -130,34 +195,129 @@ class Worker(QObject):
             if os.path.exists(self._buffbot.filename):
                 self._watcher.addPath(self._buffbot.filename)
                 self._buffbot.reload()
-                self._process(self._buffbot.filename)
+                self._read_and_process(self._buffbot.filename)
 
     def configure(self, filename, spells, acls):
         self._configure.emit(filename, spells, acls)
 
     def _process_only(self):
         self._buffbot.process()
+        self._schedule()
 
     def _read_and_process(self, path):
         self._buffbot.read()
         self._buffbot.process()
+        self._schedule()
+
+    def _report_latency(self):
+        # Only send the UI a new summary when someone has finished being buffed.
+        if (count := self._buffbot.latency.count) != self._latency_count:
+            self._latency_count = count
+            self.latencySummary.emit(self._buffbot.latency.summary())
+
+    def _schedule(self):
+        self._report_latency()
+        if (deadline := self._buffbot.next_deadline()) is None:
+            self._timer.stop()
+        else:
+            delay = (deadline - self._buffbot.clock()).total_seconds()
+            self._timer.start(max(0, math.ceil(delay * 1000)))
 
     def _callback(self, line):
-        self.logMessage.emit(datetime.datetime.now(), line)
+        # The bot logs from our thread, but its output thread logs from its own
+        # whenever sending fails, so everything goes through a signal, which Qt
+        # delivers on our thread, before we touch our logs or our timer.
+        self._logged.emit(datetime.datetime.now(), line)
 
+    def _queue_log(self, date, line):
+        self._logs.append((date, line))
+        if not self._log_timer.isActive():
+            self._log_timer.start(self._log_interval)
 
-class SpellModel(QAbstractListModel):
-    def __init__(self, *args, **kwargs):
+    def _flush_logs(self):
+        if self._logs:
+            logs, self._logs = self._logs, []
+            self.logMessages.emit(logs)
+
+
+class LogModel(QAbstractTableModel):
+
+    _headers = ["date", "line"]
+
+    def __init__(self, capacity, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.spells = []
+
+        # We keep our entries in a fixed size ring buffer, so that no matter how
+        # much gets logged, we only ever hold onto the latest capacity entries.
+        # The newest entry is shown first, so row 0 is the one we wrote last.
+        self._capacity = capacity
+        self._entries = [None] * capacity
+        self._next = 0
+        self._count = 0
+
+    def append(self, logs):
+        # There's no point in adding anything that would just get pushed back
+        # out by the rest of this batch.
+        logs = [
+            (date.strftime("%Y-%m-%d %H:%M:%S"), line)
+            for date, line in logs[-self._capacity :]
+        ]
+        if not logs:
+            return
+
+        # If this batch is going to push older entries out of the buffer, then
+        # the view can't just insert rows at the top, so we'll reset it instead,
+        # which is still only the one update for the entire batch.
+        overflow = self._count + len(logs) > self._capacity
+        if overflow:
+            self.beginResetModel()
+        else:
+            self.beginInsertRows(QModelIndex(), 0, len(logs) - 1)
+
+        for entry in logs:
+            self._entries[self._next] = entry
+            self._next = (self._next + 1) % self._capacity
+        self._count = min(self._count + len(logs), self._capacity)
+
+        if overflow:
+            self.endResetModel()
+        else:
+            self.endInsertRows()
+
+    def rowCount(self, index=QModelIndex()):
+        return 0 if index.isValid() else self._count
+
+    def columnCount(self, index=QModelIndex()):
+        return 0 if index.isValid() else len(self._headers)
 
     def data(self, index, role):
         if role == Qt.DisplayRole:
-            spell, _ = self.spells[index.row()]
-            return spell.name
+            entry = self._entries[(self._next - 1 - index.row()) % self._capacity]
+            return entry[index.column()]
+
+    def headerData(self, section, orientation, role):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self._headers[section]
+
+
+class RecordModel(QAbstractListModel):
+    def __init__(self, display, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.display = display
+        self.records = []
+
+    def set_records(self, records):
+        self.beginResetModel()
+        self.records = records
+        self.endResetModel()
+
+    def data(self, index, role):
+        if role == Qt.DisplayRole:
+            item, _ = self.records[index.row()]
+            return self.display(item)
 
     def rowCount(self, index):
-        return len(self.spells)
+        return len(self.records)
 
 
 class AddSpell(QDialog, Ui_AddSpell):
@@ -167,10 +327,21 @@ class AddSpell(QDialog, Ui_AddSpell):
         self.setupUi(self)
 
     def _extract_spell(self):
+        # Leaving a time at zero shows it as unknown, and means that we don't
+        # know it, rather than that it takes no time at all.
+        def seconds(value):
+            return datetime.timedelta(seconds=value) if value else None
+
         return Spell(
             name=self.spellName.text(),
             gem=self.spellGem.value(),
             success_message=self.spellSuccessMessage.text(),
+            duration=seconds(self.spellDuration.value()),
+            cast_time=seconds(self.spellCastTime.value()),
+            recast=seconds(self.spellRecast.value()),
+            scope=(
+                SpellScope.Group if self.spellGroup.isChecked() else SpellScope.Single
+            ),
         )
 
     @classmethod
@@ -188,6 +359,13 @@ class AddSpell(QDialog, Ui_AddSpell):
         dlg.spellName.setText(spell.name)
         dlg.spellGem.setValue(spell.gem)
         dlg.spellSuccessMessage.setText(spell.success_message)
+        if spell.duration is not None:
+            dlg.spellDuration.setValue(int(spell.duration.total_seconds()))
+        if spell.cast_time is not None:
+            dlg.spellCastTime.setValue(spell.cast_time.total_seconds())
+        if spell.recast is not None:
+            dlg.spellRecast.setValue(spell.recast.total_seconds())
+        dlg.spellGroup.setChecked(spell.scope is SpellScope.Group)
 
         if dlg.exec_():
             return dlg._extract_spell()
@@ -212,6 +390,9 @@ class AddAcl(QDialog, Ui_AddACL):
 
 
 class MainWindow(QMainWindow, Ui_MainWindow):
+
+    _configChanged = pyqtSignal(Character)
+
     def __init__(self, app_name, app_version, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
@@ -224,53 +405,24 @@ class MainWindow(QMainWindow, Ui_MainWindow):
 
         os.makedirs(os.path.dirname(config_db), exist_ok=True)
 
-        self.db = QtSql.QSqlDatabase.addDatabase("QSQLITE")
-        self.db.setDatabaseName(os.path.join(appdir, "config.db"))
-        self.db.open()
-        self.db.exec_(
-            """ CREATE TABLE state (
-                key text NOT NULL UNIQUE,
-                value text NOT NULL
-            )
-            """
-        )
-        self.db.exec_(
-            """ CREATE TABLE spells (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    character text NOT NULL,
-                    server text NOT NULL,
-                    gem INTEGER NOT NULL,
-                    name text NOT NULL,
-                    success_message text NOT NULL
-            )
-            """
-        )
-        self.db.exec_(
-            """ CREATE TABLE acls (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    character text NOT NULL,
-                    server text NOT NULL,
-                    entry text NOT NULL
-            )
-            """
-        )
+        # All of our configuration lives in the config store, which keeps it all
+        # cached in memory and does it's writing off of the UI thread, and tells
+        # us whenever a character's configuration has changed. It can tell us
+        # from its own thread, so that goes through a signal to get back to ours.
+        self.store = ConfigStore(config_db)
+        self._configChanged.connect(self.config_changed)
+        self.store.subscribe(self._configChanged.emit)
 
         self.filename = None
         self.char = None
 
         # Setup the spells models
-        self.spells = QtSql.QSqlTableModel()
-        self.spells.setTable("spells")
-        self.spells.setEditStrategy(QtSql.QSqlTableModel.OnFieldChange)
+        self.spells = RecordModel(lambda spell: spell.name)
         self.spellList.setModel(self.spells)
-        self.spellList.setModelColumn(4)
 
         # Setup the ACL models
-        self.acls = QtSql.QSqlTableModel()
-        self.acls.setTable("acls")
-        self.acls.setEditStrategy(QtSql.QSqlTableModel.OnFieldChange)
+        self.acls = RecordModel(lambda entry: entry)
         self.aclList.setModel(self.acls)
-        self.aclList.setModelColumn(3)
 
         # Setup our default UI values, we do this here instead of in QT Designer,
         # because QT Designer has default text that makes it easier to tell what
@@ -279,7 +431,11 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         self.setWindowTitle("BuffBot")
         self.character_name.setText("")
         self.character_server.setText("")
+        self.log = LogModel(500)
+        self.logTable.setModel(self.log)
         self.logTable.setColumnWidth(0, 110)
+        self.latencyLabel = QLabel()
+        self.statusbar.addPermanentWidget(self.latencyLabel)
 
         # Hookup our UI to the functions that will implement their functionality
         self.action_Open.triggered.connect(self.open_file)
@@ -305,15 +461,15 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         self.worker.started.connect(self.load_state)
         self.worker.characterDetails.connect(self.update_character)
         self.worker.monitoringFile.connect(self.update_statusbar)
-        self.worker.logMessage.connect(self.update_logger)
+        self.worker.logMessages.connect(self.update_logger)
+        self.worker.latencySummary.connect(self.update_latency)
 
         # Start our thread so it can start processing information.
         self.thread.start()
 
     def load_state(self):
-        query = self.db.exec_("SELECT value FROM state WHERE key = 'last-filename'")
-        if query.first():
-            self.filename = query.value("value")
+        if (filename := self.store.get_state("last-filename")) is not None:
+            self.filename = filename
             self._update_worker()
 
     def check_updates(self, app_name, app_version):
@@ -345,26 +501,14 @@ class MainWindow(QMainWindow, Ui_MainWindow):
                 self.app_update.extract_restart()
 
     def _get_spells(self):
-        spells = []
-        for i in range(self.spells.rowCount()):
-            record = self.spells.record(i)
-            spells.append(
-                Spell(
-                    name=record.value("name"),
-                    gem=record.value("gem"),
-                    success_message=record.value("success_message"),
-                )
-            )
-
-        return spells
+        if self.char is None:
+            return []
+        return [spell for spell, _ in self.store.spells(self.char)]
 
     def _get_acls(self):
-        acls = []
-        for i in range(self.acls.rowCount()):
-            record = self.acls.record(i)
-            acls.append(record.value("entry"))
-
-        return acls
+        if self.char is None:
+            return []
+        return [entry for entry, _ in self.store.acls(self.char)]
 
     def _update_worker(self):
         filename = self.filename
@@ -384,7 +528,7 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         # ever happen, but just in case it does, we'll just process this event as
         # normal, and let Qt close our application.
         if self.thread.isRunning():
-            self.db.close()
+            self.store.close()
             self.worker.stop()
             e.ignore()
         else:
@@ -411,12 +555,7 @@ class MainWindow(QMainWindow, Ui_MainWindow):
 
         if filename:
             self.filename = filename
-            self.db.exec_(
-                f""" INSERT INTO state (key, value)
-                        VALUES ('last-filename', '{self.filename}')
-                        ON CONFLICT (key) DO UPDATE set value = '{self.filename}'
-                """
-            )
+            self.store.set_state("last-filename", self.filename)
             self._update_worker()
 
     def update_character(self, char):
@@ -425,78 +564,55 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         self.character_name.setText(char.name)
         self.character_server.setText(char.server_display)
 
-        # Filter our spell list by the character and server that was selected, and
-        # the select our spells.
-        self.spells.setFilter(
-            f"character = '{self.char.name}' AND server = '{self.char.server.value}'"
-        )
-        self.spells.select()
-
-        self.acls.setFilter(
-            f"character = '{self.char.name}' AND server = '{self.char.server.value}'"
-        )
-        self.acls.select()
-        self._update_worker()
-
+        self.config_changed(char)
         self.enable_ui()
 
+    def config_changed(self, char):
+        # We only care about changes to the character that we're currently showing,
+        # anything else will get picked up when (and if) we switch to them.
+        if char == self.char:
+            self.spells.set_records(self.store.spells(char))
+            self.acls.set_records(self.store.acls(char))
+            self._update_worker()
+
     def update_statusbar(self, filename):
         self.statusbar.showMessage(f"Monitoring {filename}")
 
-    def update_logger(self, date, line):
-        self.logTable.insertRow(0)
-        self.logTable.setItem(
-            0, 0, QTableWidgetItem(date.strftime("%Y-%m-%d %H:%M:%S"))
+    def update_latency(self, summary):
+        total = summary["total"]
+        self.latencyLabel.setText(
+            f"Hail to buff: p50 {total['p50']:.1f}s, p95 {total['p95']:.1f}s, "
+            f"p99 {total['p99']:.1f}s"
+        )
+        # The breakdown of where that time went is in the tooltip.
+        self.latencyLabel.setToolTip(
+            "<pre>" + "\n".join(format_summary(summary)) + "</pre>"
         )
-        self.logTable.setItem(0, 1, QTableWidgetItem(line))
 
-        # We only want to keep the 500 latest entries, because we don't want our memory
-        # to grow unbounded.
-        for i in range(max(0, self.logTable.rowCount() - 500)):
-            self.logTable.removeRow(i + 500)
+    def update_logger(self, logs):
+        self.log.append(logs)
 
     def add_spell(self):
         spell = AddSpell.getNewSpell(self)
 
         if spell is not None:
-            record = self.spells.record()
-            record.setValue("character", self.char.name)
-            record.setValue("server", self.char.server.value)
-            record.setValue("name", spell.name)
-            record.setValue("gem", spell.gem)
-            record.setValue("success_message", spell.success_message)
-
-            self.spells.insertRecord(self.spells.rowCount(), record)
-            self.spells.select()
-            self._update_worker()
+            self.store.add_spell(self.char, spell)
 
     def edit_spell(self):
-        if self.spellList.currentIndex().row() >= 0:
-            record = self.spells.record(self.spellList.currentIndex().row())
-            spell = AddSpell.editSpell(
-                self,
-                Spell(
-                    name=record.value("name"),
-                    gem=record.value("gem"),
-                    success_message=record.value("success_message"),
-                ),
-            )
+        if (row := self.spellList.currentIndex().row()) >= 0:
+            original, row_id = self.spells.records[row]
+            spell = AddSpell.editSpell(self, original)
             if spell is not None:
-                record.setValue("name", spell.name)
-                record.setValue("gem", spell.gem)
-                record.setValue("success_message", spell.success_message)
-                self.spells.setRecord(self.spellList.currentIndex().row(), record)
-                self._update_worker()
+                self.store.update_spell(self.char, row_id, spell)
         else:
             QMessageBox.question(
                 self, "Error", "Please select a spell to edit.", QMessageBox.Ok
             )
 
     def delete_spell(self):
-        if self.spellList.currentIndex().row() >= 0:
-            self.spells.removeRow(self.spellList.currentIndex().row())
-            self.spells.select()
-            self._update_worker()
+        if (row := self.spellList.currentIndex().row()) >= 0:
+            _, row_id = self.spells.records[row]
+            self.store.remove_spell(self.char, row_id)
         else:
             QMessageBox.question(
                 self, "Error", "Please select a spell to delete.", QMessageBox.Ok
@@ -506,20 +622,12 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         name = AddAcl.getName(self)
 
         if name is not None:
-            record = self.acls.record()
-            record.setValue("character", self.char.name)
-            record.setValue("server", self.char.server.value)
-            record.setValue("entry", name)
-
-            self.acls.insertRecord(self.acls.rowCount(), record)
-            self.acls.select()
-            self._update_worker()
+            self.store.add_acl(self.char, name)
 
     def delete_acl(self):
-        if self.aclList.currentIndex().row() >= 0:
-            print(self.acls.removeRow(self.aclList.currentIndex().row()))
-            self.acls.select()
-            self._update_worker()
+        if (row := self.aclList.currentIndex().row()) >= 0:
+            _, row_id = self.acls.records[row]
+            self.store.remove_acl(self.char, row_id)
         else:
             QMessageBox.question(
                 self, "Error", "Please select a character to delete.", QMessageBox.Ok
@@ -14,9 +14,9 @@ from PyQt5 import QtCore, QtGui, QtWidgets
 class Ui_AddSpell(object):
     def setupUi(self, AddSpell):
         AddSpell.setObjectName("AddSpell")
-        AddSpell.resize(648, 128)
+        AddSpell.resize(648, 168)
         self.widget = QtWidgets.QWidget(AddSpell)
-        self.widget.setGeometry(QtCore.QRect(10, 10, 631, 108))
+        self.widget.setGeometry(QtCore.QRect(10, 10, 631, 148))
         self.widget.setObjectName("widget")
         self.gridLayout_3 = QtWidgets.QGridLayout(self.widget)
         self.gridLayout_3.setContentsMargins(0, 0, 0, 0)
@@ -47,11 +47,40 @@ class Ui_AddSpell(object):
         self.spellSuccessMessage.setObjectName("spellSuccessMessage")
         self.gridLayout.addWidget(self.spellSuccessMessage, 0, 1, 1, 1)
         self.gridLayout_3.addLayout(self.gridLayout, 1, 0, 1, 1)
+        self.gridLayout_4 = QtWidgets.QGridLayout()
+        self.gridLayout_4.setObjectName("gridLayout_4")
+        self.label_4 = QtWidgets.QLabel(self.widget)
+        self.label_4.setObjectName("label_4")
+        self.gridLayout_4.addWidget(self.label_4, 0, 0, 1, 1)
+        self.spellDuration = QtWidgets.QSpinBox(self.widget)
+        self.spellDuration.setMaximum(86400)
+        self.spellDuration.setObjectName("spellDuration")
+        self.gridLayout_4.addWidget(self.spellDuration, 0, 1, 1, 1)
+        self.label_5 = QtWidgets.QLabel(self.widget)
+        self.label_5.setObjectName("label_5")
+        self.gridLayout_4.addWidget(self.label_5, 0, 2, 1, 1)
+        self.spellCastTime = QtWidgets.QDoubleSpinBox(self.widget)
+        self.spellCastTime.setDecimals(1)
+        self.spellCastTime.setMaximum(60.0)
+        self.spellCastTime.setObjectName("spellCastTime")
+        self.gridLayout_4.addWidget(self.spellCastTime, 0, 3, 1, 1)
+        self.label_6 = QtWidgets.QLabel(self.widget)
+        self.label_6.setObjectName("label_6")
+        self.gridLayout_4.addWidget(self.label_6, 0, 4, 1, 1)
+        self.spellRecast = QtWidgets.QDoubleSpinBox(self.widget)
+        self.spellRecast.setDecimals(1)
+        self.spellRecast.setMaximum(3600.0)
+        self.spellRecast.setObjectName("spellRecast")
+        self.gridLayout_4.addWidget(self.spellRecast, 0, 5, 1, 1)
+        self.spellGroup = QtWidgets.QCheckBox(self.widget)
+        self.spellGroup.setObjectName("spellGroup")
+        self.gridLayout_4.addWidget(self.spellGroup, 0, 6, 1, 1)
+        self.gridLayout_3.addLayout(self.gridLayout_4, 2, 0, 1, 1)
         self.buttonBox = QtWidgets.QDialogButtonBox(self.widget)
         self.buttonBox.setOrientation(QtCore.Qt.Horizontal)
         self.buttonBox.setStandardButtons(QtWidgets.QDialogButtonBox.Cancel|QtWidgets.QDialogButtonBox.Ok)
         self.buttonBox.setObjectName("buttonBox")
-        self.gridLayout_3.addWidget(self.buttonBox, 2, 0, 1, 1)
+        self.gridLayout_3.addWidget(self.buttonBox, 3, 0, 1, 1)
 
         self.retranslateUi(AddSpell)
         self.buttonBox.accepted.connect(AddSpell.accept)
@@ -64,3 +93,13 @@ class Ui_AddSpell(object):
         self.label.setText(_translate("AddSpell", "Name"))
         self.label_2.setText(_translate("AddSpell", "Gem"))
         self.label_3.setText(_translate("AddSpell", "Success Message"))
+        self.label_4.setText(_translate("AddSpell", "Duration"))
+        self.spellDuration.setSpecialValueText(_translate("AddSpell", "Unknown"))
+        self.spellDuration.setSuffix(_translate("AddSpell", " s"))
+        self.label_5.setText(_translate("AddSpell", "Cast Time"))
+        self.spellCastTime.setSpecialValueText(_translate("AddSpell", "Unknown"))
+        self.spellCastTime.setSuffix(_translate("AddSpell", " s"))
+        self.label_6.setText(_translate("AddSpell", "Recast"))
+        self.spellRecast.setSpecialValueText(_translate("AddSpell", "Unknown"))
+        self.spellRecast.setSuffix(_translate("AddSpell", " s"))
+        self.spellGroup.setText(_translate("AddSpell", "Group Spell"))
@@ -44,16 +44,10 @@ class Ui_MainWindow(object):
         self.scrollAreaWidgetContents.setObjectName("scrollAreaWidgetContents")
         self.gridLayout_4 = QtWidgets.QGridLayout(self.scrollAreaWidgetContents)
         self.gridLayout_4.setObjectName("gridLayout_4")
-        self.logTable = QtWidgets.QTableWidget(self.scrollAreaWidgetContents)
+        self.logTable = QtWidgets.QTableView(self.scrollAreaWidgetContents)
         self.logTable.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
         self.logTable.setSelectionMode(QtWidgets.QAbstractItemView.ExtendedSelection)
-        self.logTable.setRowCount(0)
-        self.logTable.setColumnCount(2)
         self.logTable.setObjectName("logTable")
-        item = QtWidgets.QTableWidgetItem()
-        self.logTable.setHorizontalHeaderItem(0, item)
-        item = QtWidgets.QTableWidgetItem()
-        self.logTable.setHorizontalHeaderItem(1, item)
         self.logTable.horizontalHeader().setVisible(False)
         self.logTable.horizontalHeader().setStretchLastSection(True)
         self.logTable.verticalHeader().setVisible(False)
@@ -128,10 +122,6 @@ class Ui_MainWindow(object):
         self.character_name.setText(_translate("MainWindow", "CharName"))
         self.character_server_label.setText(_translate("MainWindow", "Server"))
         self.character_server.setText(_translate("MainWindow", "ServerName"))
-        item = self.logTable.horizontalHeaderItem(0)
-        item.setText(_translate("MainWindow", "date"))
-        item = self.logTable.horizontalHeaderItem(1)
-        item.setText(_translate("MainWindow", "line"))
         self.addSpellButton.setText(_translate("MainWindow", "Add"))
         self.deleteSpellButton.setText(_translate("MainWindow", "Del"))
         self.editSpellButton.setText(_translate("MainWindow", "Edit"))